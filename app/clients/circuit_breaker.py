@@ -0,0 +1,118 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from app.services import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """
+    サーキットブレーカーが開いているため、呼び出さずに失敗させた。
+    """
+
+
+class CircuitBreaker:
+    """
+    外部サービスが落ちているあいだ、呼び出しを待たずに即失敗させるサーキットブレーカー。
+
+    - closed: 通常どおり呼ぶ。障害（is_failure が True の例外）が failure_threshold 回続いたら open へ
+    - open: 呼ばずに CircuitOpenError。recovery_timeout 秒たったら half_open へ
+    - half_open: 1 件だけ試しに通し、成功なら closed、障害なら open に戻す
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        is_failure: Optional[Callable[[BaseException], bool]] = None,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._is_failure = is_failure or (lambda e: True)
+
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._update_gauge()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def is_open(self) -> bool:
+        """
+        呼んでも即失敗する状態か（half_open で試行を待っている場合は False）。
+        """
+        return self.state == OPEN
+
+    def check(self) -> None:
+        """
+        開いていれば CircuitOpenError を送出する。
+        呼び出す前に時間のかかる準備（レート制限の待ちなど）がある場合、その前に確認するのに使う。
+        """
+        if self.is_open():
+            metrics.inc("circuit_breaker_rejected_total", breaker=self.name)
+            raise CircuitOpenError(f"{self.name}: circuit is open")
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """
+        with ブロックの中で外部サービスを呼び、結果を記録する。
+
+        Raises:
+            CircuitOpenError: 開いている（または half_open で別の試行が実行中）
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == OPEN or (state == HALF_OPEN and self._probing):
+                metrics.inc("circuit_breaker_rejected_total", breaker=self.name)
+                raise CircuitOpenError(f"{self.name}: circuit is open")
+            probe = state == HALF_OPEN
+            if probe:
+                self._probing = True
+
+        try:
+            yield
+        except BaseException as e:
+            self._record(failed=self._is_failure(e), probe=probe)
+            raise
+        self._record(failed=False, probe=probe)
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._update_gauge()
+        return self._state
+
+    def _record(self, failed: bool, probe: bool) -> None:
+        with self._lock:
+            if probe:
+                self._probing = False
+            if not failed:
+                self._failures = 0
+                if self._state != CLOSED:
+                    print(f"[WARN] Circuit '{self.name}' closed.")
+                self._state = CLOSED
+            else:
+                self._failures += 1
+                if probe or self._failures >= self.failure_threshold:
+                    if self._state != OPEN:
+                        print(f"[WARN] Circuit '{self.name}' opened after {self._failures} failures.")
+                    self._state = OPEN
+                    self._opened_at = time.monotonic()
+            self._update_gauge()
+
+    def _update_gauge(self) -> None:
+        metrics.set_gauge("circuit_breaker_state", _STATE_VALUES[self._state], breaker=self.name)
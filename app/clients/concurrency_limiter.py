@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Iterator, Optional
+
+from app.services import metrics
+
+
+class AdaptiveLimiter:
+    """
+    観測したレイテンシと過負荷エラー (429 / RESOURCE_EXHAUSTED) から、
+    同時実行数の上限を自動で調整するリミッター（AIMD）。
+
+    - 成功し、レイテンシが基準（直近の最小レイテンシ × latency_tolerance、差が latency_slack 秒以内は許容）以内なら
+      上限を 1/limit ずつ増やす（上限いっぱいまで使っているときだけ）
+    - レイテンシが基準を超えたら上限を latency_backoff 倍に減らす
+    - 過負荷エラーなら上限を overload_backoff 倍に減らす
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: float = 4,
+        min_limit: float = 1,
+        max_limit: float = 64,
+        latency_tolerance: float = 2.0,
+        latency_slack: float = 0.05,
+        latency_backoff: float = 0.9,
+        overload_backoff: float = 0.5,
+        is_overload: Optional[Callable[[BaseException], bool]] = None,
+        window: int = 100,
+    ):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.latency_slack = latency_slack
+        self.latency_backoff = latency_backoff
+        self.overload_backoff = overload_backoff
+        self._is_overload = is_overload or (lambda e: False)
+
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._cond = threading.Condition()
+        self._update_gauges()
+
+    @property
+    def limit(self) -> int:
+        return max(int(self._limit), 1)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None) -> Iterator[None]:
+        """
+        実行枠を 1 つ確保して with ブロックを実行し、結果から上限を調整する。
+
+        Raises:
+            TimeoutError: timeout 秒以内に枠が空かなかった
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._in_flight >= self.limit:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    metrics.inc("concurrency_limiter_rejected_total", limiter=self.name)
+                    raise TimeoutError(f"{self.name}: timed out waiting for a concurrency slot")
+                self._cond.wait(remaining)
+            self._in_flight += 1
+            in_flight_at_start = self._in_flight
+            self._update_gauges()
+
+        started = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            with self._cond:
+                self._in_flight -= 1
+                if self._is_overload(e):
+                    self._decrease(self.overload_backoff)
+                self._update_gauges()
+                self._cond.notify_all()
+            raise
+
+        latency = time.monotonic() - started
+        with self._cond:
+            self._in_flight -= 1
+            self._on_success(latency, in_flight_at_start)
+            self._update_gauges()
+            self._cond.notify_all()
+
+    def _on_success(self, latency: float, in_flight_at_start: int) -> None:
+        self._latencies.append(latency)
+        baseline = min(self._latencies)
+        # 数十 ms 程度の揺らぎでは下げない
+        if latency > baseline * self.latency_tolerance and latency - baseline > self.latency_slack:
+            self._decrease(self.latency_backoff)
+        elif in_flight_at_start >= self.limit / 2:
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+
+    def _decrease(self, factor: float) -> None:
+        self._limit = max(self.min_limit, self._limit * factor)
+
+    def _update_gauges(self) -> None:
+        metrics.set_gauge("concurrency_limit", self.limit, limiter=self.name)
+        metrics.set_gauge("concurrency_in_flight", self._in_flight, limiter=self.name)
@@ -1,9 +1,21 @@
+import hashlib
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date, timedelta
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, List, Optional
 
 from dotenv import load_dotenv
 import google.generativeai as genai
+from google.api_core import exceptions as api_exceptions
+from google.api_core import retry as api_retry
+
+from app.clients.circuit_breaker import CircuitBreaker
+from app.clients.concurrency_limiter import AdaptiveLimiter
+from app.clients.llm_executor import Attempt, LatencyTracker, run_with_deadline
+from app.clients.local_parser import parse_task_text_degraded, parse_task_text_locally
+from app.services import metrics
+from app.services.tracing import traced
 
 load_dotenv()
 
@@ -13,14 +25,105 @@ if not GEMINI_API_KEY:
 
 genai.configure(api_key=GEMINI_API_KEY)
 
+# モデル設定
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.5-flash")
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "gemini-2.5-flash-lite")
+
+# 1 回の parse_task_text にかけてよい最大時間（秒）
+LLM_DEADLINE_SEC = float(os.getenv("LLM_DEADLINE_SEC", "10"))
+# 締切の何秒前になったら軽量モデルに切り替えるか
+LLM_FALLBACK_MARGIN_SEC = float(os.getenv("LLM_FALLBACK_MARGIN_SEC", "3"))
+# hedge リクエストを投げるまでの待ち時間の下限（秒）。実際は p95 レイテンシと大きい方を使う
+LLM_HEDGE_MIN_DELAY_SEC = float(os.getenv("LLM_HEDGE_MIN_DELAY_SEC", "1"))
+
+# トークン使用量のメトリクスで、ユーザーを何個のバケットに分けて集計するか（0 ならユーザー別に分けない）
+LLM_USAGE_USER_BUCKETS = int(os.getenv("LLM_USAGE_USER_BUCKETS", "64"))
+# トークン使用量のメトリクスでそのまま使うエンドポイント名（それ以外は "other"）
+USAGE_ENDPOINTS = ("line", "web", "benchmark")
+
+_latency = LatencyTracker(default=float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_SEC", "3")))
+
+
+def _is_overload_error(e: BaseException) -> bool:
+    """
+    Gemini の 429 / RESOURCE_EXHAUSTED かどうか（SDK のリトライが包んだ RetryError なら元の例外で判定する）。
+    """
+    if isinstance(e, api_exceptions.RetryError) and e.cause is not None:
+        return _is_overload_error(e.cause)
+    if isinstance(e, (api_exceptions.ResourceExhausted, api_exceptions.TooManyRequests)):
+        return True
+    return getattr(e, "code", None) == 429 or "RESOURCE_EXHAUSTED" in str(e)
+
+
+def _is_outage_error(e: BaseException) -> bool:
+    """
+    Gemini の障害（5xx・タイムアウト・接続エラー）かどうか。ブレーカーはこれだけを失敗として数える。
+    400 などの入力エラーと、429（同時実行数のリミッターで扱う）は含まない。
+    """
+    if isinstance(e, api_exceptions.RetryError):
+        # 原因がなければ、SDK のリトライが締切まで一時的なエラーを繰り返したということ
+        return e.cause is None or _is_outage_error(e.cause)
+    return isinstance(e, (api_exceptions.ServerError, OSError))
+
+
+def _should_retry(e: BaseException) -> bool:
+    """
+    SDK 内で再試行してよい一時的なエラーか。
+    429 はリミッターの枠を握ったまま再試行せず、すぐに返して同時実行数を下げさせる。
+    """
+    return api_retry.if_transient_error(e) and not _is_overload_error(e)
+
+
+# Gemini への同時リクエスト数はレイテンシと 429 を見ながら自動調整する
+_limiter = AdaptiveLimiter(
+    "gemini",
+    initial_limit=float(os.getenv("LLM_CONCURRENCY_INITIAL", "4")),
+    min_limit=float(os.getenv("LLM_CONCURRENCY_MIN", "1")),
+    max_limit=float(os.getenv("LLM_CONCURRENCY_MAX", "32")),
+    is_overload=_is_overload_error,
+)
+
+# Gemini の障害が続いたら、しばらく呼ばずに縮退モード（原文タイトル + ローカルの期限）にする
+_breaker = CircuitBreaker(
+    "gemini",
+    failure_threshold=int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5")),
+    recovery_timeout=float(os.getenv("LLM_BREAKER_RECOVERY_SEC", "30")),
+    is_failure=_is_outage_error,
+)
+
+_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LLM_MAX_WORKERS", "16")),
+    thread_name_prefix="llm",
+)
+
 
 # ----------------------------
 # メイン関数
 # ----------------------------
-def parse_task_text(text: str) -> Dict[str, Any]:
+@traced("llm_client.parse_task_text")
+def parse_task_text(
+    text: str,
+    deadline: Optional[float] = None,
+    classify: bool = True,
+    user_id: Optional[str] = None,
+    endpoint: Optional[str] = None,
+) -> Dict[str, Any]:
     """
     Gemini API を使って、日本語の自然文タスク文を Task JSON に変換する。
 
+    - primary が p95 レイテンシを過ぎても返らなければ同じモデルで hedge リクエストを投げる
+    - 締切が近づいたら軽量モデル (LLM_FALLBACK_MODEL) に切り替える
+    - 締切までにどれも返らなければローカルの日付・キーワード解析で代用する
+    - Gemini のブレーカーが開いている間は呼ばずに縮退モード（原文タイトル + ローカルの期限）で返す
+
+    Args:
+        text: ユーザーが入力したタスク文
+        deadline: 締切（秒）。None なら LLM_DEADLINE_SEC
+        classify: False ならカテゴリ・優先度は聞かず、タイトル・期限・メモだけを抽出する
+            （ローカル分類器で判定する場合。出力トークンとレイテンシを節約できる）
+        user_id: トークン使用量を集計するユーザー
+        endpoint: トークン使用量を集計するエンドポイント（"line" / "web" など）
+
     Returns:
         dict: {
             "title": str,
@@ -30,13 +133,124 @@ def parse_task_text(text: str) -> Dict[str, Any]:
         }
     """
 
-    prompt = build_prompt(text)
-    model = genai.GenerativeModel("gemini-2.5-flash")
+    # ブレーカーが開いている間は Gemini を待たずに縮退モードで返す
+    if _breaker.is_open():
+        metrics.inc("llm_degraded_total")
+        return parse_task_text_degraded(text)
+
+    prompt = build_prompt(text) if classify else build_extraction_prompt(text)
+
+    return _run_attempts(
+        prompt,
+        decode=_decode_task,
+        local_fallback=lambda: parse_task_text_locally(text),
+        deadline=deadline,
+        usage_labels={"user": usage_user_label(user_id), "endpoint": usage_endpoint_label(endpoint)},
+    )
+
+
+@traced("llm_client.parse_multiple_tasks")
+def parse_multiple_tasks(
+    texts: List[str],
+    deadline: Optional[float] = None,
+    classify: bool = True,
+    user_id: Optional[str] = None,
+    endpoint: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    複数のタスク文を 1 回の Gemini 呼び出しでまとめて Task JSON のリストに変換する。
+    短いメッセージを続けて送られたときに、呼び出し回数とプロンプトの固定部分のトークンを節約する。
+
+    締切・hedge・フォールバック・縮退モードの扱いは parse_task_text() と同じ。
+    Gemini が入力と違う件数を返したら失敗とみなし、次の試行（最終的にはローカル解析）に回す。
+
+    Returns:
+        texts と同じ順番・同じ件数の dict のリスト（各要素は parse_task_text() と同じ形式）
+    """
+    if len(texts) == 1:
+        return [parse_task_text(texts[0], deadline=deadline, classify=classify, user_id=user_id, endpoint=endpoint)]
+
+    if _breaker.is_open():
+        metrics.inc("llm_degraded_total", len(texts))
+        return [parse_task_text_degraded(text) for text in texts]
+
+    return _run_attempts(
+        build_batch_prompt(texts, classify=classify),
+        decode=lambda response_text: _decode_tasks(response_text, expected=len(texts)),
+        local_fallback=lambda: [parse_task_text_locally(text) for text in texts],
+        deadline=deadline,
+        usage_labels={"user": usage_user_label(user_id), "endpoint": usage_endpoint_label(endpoint)},
+    )
+
+
+def _run_attempts(
+    prompt: str,
+    decode: Callable[[str], Any],
+    local_fallback: Callable[[], Any],
+    deadline: Optional[float],
+    usage_labels: Dict[str, str],
+) -> Any:
+    """
+    primary / hedge / fallback の試行を組み立てて、締切付きで実行する。
+    """
+    deadline = LLM_DEADLINE_SEC if deadline is None else deadline
+
+    hedge_delay = max(LLM_HEDGE_MIN_DELAY_SEC, _latency.percentile(95))
+    fallback_at = max(0.0, deadline - LLM_FALLBACK_MARGIN_SEC)
+
+    def _attempt(model_name: str) -> Callable[[float], Any]:
+        return lambda timeout: decode(_generate(model_name, prompt, timeout, usage_labels))
+
+    attempts = [
+        Attempt("primary", 0.0, _attempt(LLM_MODEL)),
+        Attempt("fallback", fallback_at, _attempt(LLM_FALLBACK_MODEL)),
+    ]
+    if hedge_delay < fallback_at:
+        attempts.insert(1, Attempt("hedge", hedge_delay, _attempt(LLM_MODEL)))
+
+    def _on_success(attempt: Attempt, seconds: float) -> None:
+        # hedge 判定は primary モデルのレイテンシ分布で行う
+        if attempt.name != "fallback":
+            _latency.record(seconds)
+
+    return run_with_deadline(
+        attempts,
+        deadline=deadline,
+        local_fallback=local_fallback,
+        pool=_pool,
+        on_success=_on_success,
+    )
+
+
+@traced("llm_client.generate")
+def _generate(
+    model_name: str,
+    prompt: str,
+    timeout: float,
+    usage_labels: Optional[Dict[str, str]] = None,
+) -> str:
+    """
+    指定モデルで 1 回だけ Gemini を呼び、回答のテキストを返す。
+    usage_metadata のトークン数は usage_labels（user / endpoint）ごとにメトリクスへ記録する。
+    """
+    model = genai.GenerativeModel(model_name)
+
+    started = time.monotonic()
+    with _limiter.acquire(timeout=timeout), _breaker.guard():
+        remaining = max(0.1, timeout - (time.monotonic() - started))
+        # SDK 標準のリトライは最大 600 秒粘るので、残り時間で打ち切る
+        response = model.generate_content(
+            prompt,
+            request_options={"timeout": remaining, "retry": api_retry.Retry(predicate=_should_retry, timeout=remaining)},
+        )
 
-    response = model.generate_content(prompt)
+    record_token_usage(response, model_name, **(usage_labels or {}))
+    return response.text
 
+
+def _decode_task(response_text: str) -> Dict[str, Any]:
     # Gemini は時々余計なテキストを返すので JSON 抽出が必要
-    json_dict = extract_json_from_response(response.text)
+    json_dict = extract_json_from_response(response_text)
 
     # 最終的に日付形式の整形
     json_dict["due_date"] = normalize_date(json_dict.get("due_date"))
@@ -44,6 +258,59 @@ def parse_task_text(text: str) -> Dict[str, Any]:
     return json_dict
 
 
+def _decode_tasks(response_text: str, expected: int) -> List[Dict[str, Any]]:
+    items = extract_json_array_from_response(response_text)
+    if len(items) != expected or not all(isinstance(item, dict) for item in items):
+        raise ValueError(f"Gemini returned {len(items)} tasks for {expected} inputs.")
+
+    for item in items:
+        item["due_date"] = normalize_date(item.get("due_date"))
+    return items
+
+
+# ----------------------------
+# トークン使用量
+# ----------------------------
+def usage_user_label(user_id: Optional[str]) -> str:
+    """
+    トークン使用量のメトリクスに付けるユーザーのラベル。
+    /metrics は認証なしで公開されるので LINE のユーザー ID はそのまま出さず、
+    ハッシュで LLM_USAGE_USER_BUCKETS 個のバケットに振り分ける（系列数も一定に収まる）。
+    """
+    if not user_id:
+        return "anonymous"
+    if LLM_USAGE_USER_BUCKETS <= 0:
+        return "all"
+    digest = hashlib.blake2b(user_id.encode("utf-8"), digest_size=8).digest()
+    return f"bucket-{int.from_bytes(digest, 'big') % LLM_USAGE_USER_BUCKETS}"
+
+
+def usage_endpoint_label(endpoint: Optional[str]) -> str:
+    """
+    トークン使用量のメトリクスに付けるエンドポイントのラベル。
+    endpoint は /parse-and-create の source（クライアントが自由に指定できる）なので、
+    USAGE_ENDPOINTS 以外はすべて "other" にまとめて系列数を一定に保つ。
+    """
+    return endpoint if endpoint in USAGE_ENDPOINTS else "other"
+
+
+def record_token_usage(response: Any, model_name: str, **labels: str) -> None:
+    """
+    Gemini の usage_metadata から prompt / response のトークン数を記録する。
+    hedge で負けた呼び出しも課金されるので、完了した呼び出しはすべて数える。
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+    response_tokens = getattr(usage, "candidates_token_count", 0) or 0
+
+    metrics.inc("llm_calls_total", model=model_name, **labels)
+    metrics.inc("llm_tokens_total", prompt_tokens, kind="prompt", model=model_name, **labels)
+    metrics.inc("llm_tokens_total", response_tokens, kind="response", model=model_name, **labels)
+
+
 # ----------------------------
 # プロンプト構築
 # ----------------------------
@@ -100,6 +367,76 @@ JSON のみを返してください。
 """
 
 
+def build_extraction_prompt(text: str) -> str:
+    """
+    タイトル・期限・メモだけを抽出する短いプロンプトを組み立てる。
+    カテゴリと優先度はローカル分類器で決める場合に使う。
+    """
+
+    today = date.today().isoformat()
+
+    return f"""
+日本語の自然文からタスク情報を抽出し、次の JSON だけを返してください：
+
+{{
+  "title": string,              // タスク名（短く簡潔に）
+  "due_date": string | null,    // YYYY-MM-DD 形式 or null
+  "notes": string | null
+}}
+
+- 現在日付は {today} です。
+- 「今日」「明日」「金曜」「来週」など相対表現は日付に変換し、推定できなければ null にしてください。
+
+# 入力文
+{text}
+"""
+
+
+def build_batch_prompt(texts: List[str], classify: bool = True) -> str:
+    """
+    複数のタスク文をまとめて抽出するプロンプトを組み立てる。
+    入力には番号を振り、同じ順番・同じ件数の JSON 配列で返させる。
+    classify=False ならカテゴリ・優先度は聞かない（ローカル分類器で決める場合）。
+    """
+
+    today = date.today().isoformat()
+    # 改行が入ると番号付きの行がずれるので 1 行にまとめる
+    numbered = "\n".join(f"{i}. {' '.join(text.split())}" for i, text in enumerate(texts, start=1))
+
+    fields = [
+        '  "title": string,              // タスク名（短く簡潔に）',
+        '  "due_date": string | null,    // YYYY-MM-DD 形式 or null',
+        '  "notes": string | null',
+    ]
+    rules = ""
+    if classify:
+        fields[-1] += ","
+        fields += [
+            '  "priority": "low" | "medium" | "high",',
+            '  "category": "Research" | "Job" | "Private" | "Classes" | "Others"',
+        ]
+        rules = """
+- 優先度は期限が直近なら "high" か "medium"、遠い・重要度が低そうなら "low" か "medium" にしてください。
+- カテゴリは 研究（ゼミ・論文・実験・発表）→ "Research"、就活（ES・面接・説明会）→ "Job"、
+  プライベート（買い物・飲み会・掃除・美容院）→ "Private"、授業（レポート・課題・試験）→ "Classes"、
+  それ以外 → "Others" にしてください。"""
+
+    return f"""
+日本語の自然文で書かれた {len(texts)} 件のタスクから、それぞれ次の形のオブジェクトを作り、
+入力と同じ順番・同じ件数の JSON 配列だけを返してください：
+
+{{
+{chr(10).join(fields)}
+}}
+
+- 現在日付は {today} です。
+- 「今日」「明日」「金曜」「来週」など相対表現は日付に変換し、推定できなければ null にしてください。{rules}
+
+# 入力（{len(texts)} 件）
+{numbered}
+"""
+
+
 # ----------------------------
 # Gemini の回答から JSON 抽出
 # ----------------------------
@@ -125,6 +462,26 @@ def extract_json_from_response(text: str) -> Dict[str, Any]:
         raise ValueError(f"Invalid JSON returned from Gemini: {json_str}")
 
 
+def extract_json_array_from_response(text: str) -> List[Any]:
+    """
+    Gemini の回答から JSON 配列部分のみ抽出してパースする。
+    """
+
+    import json
+    import re
+
+    match = re.search(r"\[[\s\S]*\]", text)
+    if not match:
+        raise ValueError(f"Gemini response does not contain a JSON array: {text}")
+
+    json_str = match.group(0)
+
+    try:
+        return json.loads(json_str)
+    except json.JSONDecodeError:
+        raise ValueError(f"Invalid JSON returned from Gemini: {json_str}")
+
+
 # ----------------------------
 # 日付の正規化
 # ----------------------------
@@ -0,0 +1,128 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Deque, Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+# ----------------------------
+# レイテンシ計測
+# ----------------------------
+class LatencyTracker:
+    """
+    直近 window 件の LLM 呼び出しレイテンシを保持し、パーセンタイルを返す。
+    サンプルが少ないうちは default を返す。
+    """
+
+    def __init__(self, window: int = 200, default: float = 2.0, min_samples: int = 20):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._default = default
+        self._min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> float:
+        with self._lock:
+            if len(self._samples) < self._min_samples:
+                return self._default
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+# ----------------------------
+# 試行（primary / hedge / fallback）
+# ----------------------------
+@dataclass
+class Attempt(Generic[T]):
+    """
+    1 回分の LLM 呼び出し。
+
+    Attributes:
+        name: ログ用の名前（"primary", "hedge", "fallback" など）
+        start_at: 締切基準の開始時刻（呼び出し開始からの秒数）
+        call: 残り時間（秒）を受け取り、結果を返す関数
+    """
+
+    name: str
+    start_at: float
+    call: Callable[[float], T]
+
+
+def run_with_deadline(
+    attempts: List[Attempt[T]],
+    deadline: float,
+    local_fallback: Callable[[], T],
+    pool: ThreadPoolExecutor,
+    on_success: Optional[Callable[[Attempt[T], float], None]] = None,
+) -> T:
+    """
+    attempts を start_at の時刻になったら順に投げ、最初に成功した結果を返す。
+
+    - 先に投げた試行が失敗して実行中の試行がなくなった場合は、次の試行を前倒しで投げる
+    - deadline 秒を過ぎても成功しなければ local_fallback() の結果を返す
+    - 勝負がついた時点で、負けた試行はキャンセルする
+      （実行中のスレッドは止められないので、各試行に渡した残り時間で打ち切られる）
+
+    Args:
+        attempts: start_at 昇順の試行リスト
+        deadline: 全体の締切（秒）
+        local_fallback: 全試行が間に合わなかったときに使う関数
+        pool: 試行を実行するスレッドプール
+        on_success: 成功した試行とそのレイテンシを受け取るコールバック
+
+    Returns:
+        最初に成功した試行の結果、または local_fallback() の結果
+    """
+    started = time.monotonic()
+    pending = {}
+    queue = list(attempts)
+
+    def _launch(attempt: Attempt[T]) -> None:
+        remaining = deadline - (time.monotonic() - started)
+        if remaining <= 0:
+            return
+        launched_at = time.monotonic()
+        # トレースなどのコンテキストをワーカースレッドに引き継ぐ
+        future = pool.submit(contextvars.copy_context().run, attempt.call, remaining)
+        pending[future] = (attempt, launched_at)
+
+    try:
+        while True:
+            elapsed = time.monotonic() - started
+
+            # 開始時刻を過ぎた試行、または実行中がなければ次の試行を投げる
+            while queue and (queue[0].start_at <= elapsed or not pending):
+                _launch(queue.pop(0))
+
+            if not pending:
+                break
+
+            remaining = deadline - elapsed
+            if remaining <= 0:
+                break
+            next_start = queue[0].start_at - elapsed if queue else remaining
+            timeout = max(0.0, min(remaining, next_start))
+
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                attempt, launched_at = pending.pop(future)
+                error = future.exception()
+                if error is None:
+                    if on_success:
+                        on_success(attempt, time.monotonic() - launched_at)
+                    return future.result()
+                print(f"[WARN] LLM attempt '{attempt.name}' failed: {error}")
+    finally:
+        for future in pending:
+            future.cancel()
+
+    print("[WARN] LLM attempts did not finish before the deadline. Using local parser.")
+    return local_fallback()
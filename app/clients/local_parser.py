@@ -0,0 +1,162 @@
+import re
+from datetime import date, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+
+# ----------------------------
+# カテゴリ判定用キーワード（build_prompt のルールと同じもの）
+# ----------------------------
+CATEGORY_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "Research": ("ゼミ", "発表", "論文", "研究", "実験", "スライド"),
+    "Job": ("ES", "面接", "説明会", "エントリー", "OB訪問", "SPI", "就活"),
+    "Private": ("買い物", "飲み会", "ゲーム", "掃除", "美容院", "旅行", "ジム"),
+    "Classes": ("レポート", "課題", "試験", "予習", "復習", "出席", "授業", "講義"),
+}
+
+WEEKDAYS = ["月", "火", "水", "木", "金", "土", "日"]
+
+_MONTH_DAY_RE = re.compile(r"(\d{1,2})\s*(?:/|月)\s*(\d{1,2})\s*日?")
+_DAYS_LATER_RE = re.compile(r"(\d{1,2})\s*日後")
+_WEEKDAY_RE = re.compile(r"(来週の?)?([月火水木金土日])曜日?")
+_RELATIVE_WORDS: Tuple[Tuple[str, int], ...] = (
+    ("明後日", 2),
+    ("あさって", 2),
+    ("明日", 1),
+    ("あした", 1),
+    ("今日", 0),
+    ("本日", 0),
+)
+# 「明日香」のように語の途中に現れたものは日付として扱わない（直後が助詞・時間帯・記号・文末のときだけ採用）
+_RELATIVE_WORD_END_RE = re.compile(r"$|[^\u3040-\u30ff\u4e00-\u9fff]|[のにへでまはかも]|午前|午後|朝|夜|中")
+_DEADLINE_SUFFIX_RE = re.compile(r"^(の)?(午前|午後|朝|夜|中)?(まで(に)?|[にへで])?[、,\s]*")
+
+
+# 障害中に原文のまま登録したタスクのメモ（あとで整理しやすいように）
+DEGRADED_NOTE = "Gemini に接続できなかったため、入力文をそのままタイトルにしています"
+
+
+def parse_task_text_locally(text: str, today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    LLM を使わずに、キーワードと日付表現だけでタスク文を Task JSON に変換する。
+    Gemini がタイムアウトしたときなどの最終フォールバック。
+
+    Returns:
+        dict: parse_task_text() と同じ形式
+    """
+    today = today or date.today()
+
+    due, span = extract_due_date(text, today=today)
+    title = _strip_date_expression(text, span).strip() or text.strip()
+
+    return {
+        "title": title,
+        "due_date": due.isoformat() if due else None,
+        "priority": guess_priority(due, today=today),
+        "notes": None,
+        "category": guess_category(text),
+    }
+
+
+def parse_task_text_degraded(text: str, today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Gemini の障害中（サーキットブレーカーが開いている間）に使う最小限の変換。
+    入力を取りこぼさないよう、タイトルは原文のまま、期限だけローカルで読み取る。
+
+    Returns:
+        dict: parse_task_text() と同じ形式
+    """
+    today = today or date.today()
+
+    due, _ = extract_due_date(text, today=today)
+
+    return {
+        "title": text.strip(),
+        "due_date": due.isoformat() if due else None,
+        "priority": guess_priority(due, today=today),
+        "notes": DEGRADED_NOTE,
+        "category": guess_category(text),
+    }
+
+
+def extract_due_date(
+    text: str,
+    today: Optional[date] = None,
+) -> Tuple[Optional[date], Optional[Tuple[int, int]]]:
+    """
+    文中の日付表現（今日 / 明日 / 金曜 / 12/24 / 3日後 など）を date に変換する。
+
+    Returns:
+        (期限, 日付表現の位置 (start, end))。見つからなければ (None, None)
+    """
+    today = today or date.today()
+
+    m = _MONTH_DAY_RE.search(text)
+    if m:
+        month, day = int(m.group(1)), int(m.group(2))
+        try:
+            d = date(today.year, month, day)
+            if d < today:
+                d = date(today.year + 1, month, day)
+            return d, m.span()
+        except ValueError:
+            pass
+
+    m = _DAYS_LATER_RE.search(text)
+    if m:
+        return today + timedelta(days=int(m.group(1))), m.span()
+
+    for word, offset in _RELATIVE_WORDS:
+        for m in re.finditer(re.escape(word), text):
+            if _RELATIVE_WORD_END_RE.match(text, m.end()):
+                return today + timedelta(days=offset), m.span()
+
+    m = _WEEKDAY_RE.search(text)
+    if m:
+        target = WEEKDAYS.index(m.group(2))
+        days_ahead = (target - today.weekday()) % 7
+        if m.group(1):
+            # 「来週の金曜」→ 来週の月曜を起点にする
+            days_ahead = (7 - today.weekday()) + target
+        return today + timedelta(days=days_ahead), m.span()
+
+    if "来週" in text:
+        pos = text.find("来週")
+        return today + timedelta(days=7), (pos, pos + 2)
+
+    return None, None
+
+
+def guess_priority(due: Optional[date], today: Optional[date] = None) -> str:
+    """
+    期限までの日数から優先度を決める（build_prompt の「優先度の目安」と同じ考え方）。
+    """
+    if due is None:
+        return "medium"
+    today = today or date.today()
+    days = (due - today).days
+    if days <= 1:
+        return "high"
+    if days <= 7:
+        return "medium"
+    return "low"
+
+
+def guess_category(text: str) -> str:
+    """
+    キーワードでカテゴリを決める。該当なしなら "Others"。
+    """
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        if any(k in text for k in keywords):
+            return category
+    return "Others"
+
+
+def _strip_date_expression(text: str, span: Optional[Tuple[int, int]]) -> str:
+    """
+    タイトルから日付表現と「までに」などの助詞を取り除く。
+    """
+    if not span:
+        return text
+    start, end = span
+    rest = _DEADLINE_SUFFIX_RE.sub("", text[end:], count=1)
+    return text[:start] + rest
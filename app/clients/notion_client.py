@@ -1,9 +1,20 @@
+import json
 import os
+import threading
+import time
 from datetime import date
-from typing import Any, Dict, Optional, List
+from typing import Any, Callable, Dict, Optional, List, TypeVar
 
+import httpx
 from dotenv import load_dotenv
 from notion_client import Client
+from notion_client.errors import HTTPResponseError, RequestTimeoutError
+
+from app.clients.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.clients.notion_tenants import Tenant, load_tenants
+from app.clients.rate_limiter import RateLimitExceeded
+from app.services import metrics
+from app.services.tracing import traced
 
 
 # .env から環境変数読み込み
@@ -17,10 +28,185 @@ if not NOTION_API_KEY:
 if not NOTION_DATABASE_ID:
     raise ValueError("Environment variable NOTION_DATABASE_ID is not set.")
 
-# Notion クライアント初期化
+# 同じ条件のクエリ結果を使い回す秒数（0 なら同時実行中の合流だけ行い、結果は保持しない）
+NOTION_QUERY_CACHE_TTL_SEC = float(os.getenv("NOTION_QUERY_CACHE_TTL_SEC", "0"))
+
+# クエリ時に extract_task_summary が読むプロパティだけを返させる（filter_properties）
+NOTION_PROPERTY_PROJECTION = os.getenv("NOTION_PROPERTY_PROJECTION", "true").lower() not in ("0", "false", "no")
+
+# ユーザー・チームごとに書き込み先のインテグレーションと DB を分ける設定ファイル（notion_tenants.py 参照）
+NOTION_TENANTS_FILE = os.getenv("NOTION_TENANTS_FILE")
+
+# インテグレーション（テナント）ごとのレート制限。Notion の上限は平均 3 回/秒
+NOTION_RATE_LIMIT_RPS = float(os.getenv("NOTION_RATE_LIMIT_RPS", "3"))
+NOTION_RATE_LIMIT_BURST = float(os.getenv("NOTION_RATE_LIMIT_BURST", "10"))
+# レート制限の待ちがこれを超えるなら待たずにエラーにする
+NOTION_RATE_LIMIT_MAX_WAIT_SEC = float(os.getenv("NOTION_RATE_LIMIT_MAX_WAIT_SEC", "30"))
+
+# 障害が続いたテナントへの呼び出しを止める回数と、再試行までの秒数
+NOTION_BREAKER_FAILURE_THRESHOLD = int(os.getenv("NOTION_BREAKER_FAILURE_THRESHOLD", "5"))
+NOTION_BREAKER_RECOVERY_SEC = float(os.getenv("NOTION_BREAKER_RECOVERY_SEC", "30"))
+
+# ユーザー ID を書き込む rich_text プロパティ名（未設定ならユーザー列を使わず、ユーザーでの絞り込みもできない）
+NOTION_USER_PROPERTY = os.getenv("NOTION_USER_PROPERTY")
+
+# extract_task_summary が読むプロパティ（url と id はページ直下なので常に返る）
+SUMMARY_PROPERTIES = ("Title", "Due", "Priority", "Category", "Status")
+
+T = TypeVar("T")
+
+# Notion クライアント初期化（デフォルトテナント用）
 notion = Client(auth=NOTION_API_KEY)
 
 
+def is_outage_error(e: BaseException) -> bool:
+    """
+    Notion が使えない状態（ブレーカーが開いている・タイムアウト・接続エラー・5xx・429・
+    テナントのレート制限の待ちが長すぎる）を表す例外か。入力ミス（400 など）は含まない。
+    """
+    if isinstance(e, (CircuitOpenError, RateLimitExceeded, RequestTimeoutError, httpx.TransportError)):
+        return True
+    return isinstance(e, HTTPResponseError) and (e.status >= 500 or e.status == 429)
+
+
+def _new_breaker(name: str) -> CircuitBreaker:
+    return CircuitBreaker(
+        name,
+        failure_threshold=NOTION_BREAKER_FAILURE_THRESHOLD,
+        recovery_timeout=NOTION_BREAKER_RECOVERY_SEC,
+        is_failure=is_outage_error,
+    )
+
+
+_tenants = load_tenants(
+    NOTION_TENANTS_FILE,
+    NOTION_DATABASE_ID,
+    NOTION_RATE_LIMIT_RPS,
+    NOTION_RATE_LIMIT_BURST,
+    new_breaker=_new_breaker,
+)
+
+
+def _tenant_for(user_id: Optional[str]) -> Tenant:
+    return _tenants.tenant_for(user_id)
+
+
+def has_user_scope(user_id: Optional[str]) -> bool:
+    """
+    user_id のタスクを他のユーザーのタスクと区別できるか。
+    NOTION_USER_PROPERTY でユーザー列を持っているか、ユーザー（チーム）専用のテナントに振り分けられていれば True。
+    デフォルトの DB をユーザー列なしで共有している場合は、誰のタスクか区別できないので False。
+    """
+    if not user_id:
+        return False
+    return bool(NOTION_USER_PROPERTY) or _tenant_for(user_id) is not _tenants.default
+
+
+def _call(tenant: Tenant, fn: Callable[[Client], T]) -> T:
+    """
+    テナントのクライアントで Notion API を 1 回呼ぶ。
+    ブレーカーが開いていれば待たずに CircuitOpenError、閉じていればレート制限の枠を取ってから呼ぶ。
+    レート制限の待ちすぎ（RateLimitExceeded）は Notion の障害ではないので、ブレーカーには数えない。
+    """
+    tenant.breaker.check()
+    tenant.limiter.acquire(timeout=NOTION_RATE_LIMIT_MAX_WAIT_SEC)
+    with tenant.breaker.guard():
+        metrics.inc("notion_requests_total", tenant=tenant.name)
+        return fn(tenant.client if tenant.client is not None else notion)
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class _SingleFlight:
+    """
+    同じキーの処理が実行中なら、新たに実行せず実行中の結果を待って共有する。
+    ttl > 0 なら結果を ttl 秒だけキャッシュする。invalidate() でキャッシュを捨て、
+    実行中の処理にもそれ以降は合流しないようにする（書き込み後に古い結果を返さないため）。
+    """
+
+    def __init__(self, ttl: float = 0.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._cache: Dict[str, tuple] = {}
+        self._generation = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                metrics.inc("notion_query_total", outcome="cached")
+                return cached[1]
+
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                generation = self._generation
+
+        if not leader:
+            metrics.inc("notion_query_total", outcome="coalesced")
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.inc("notion_query_total", outcome="executed")
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                if call.error is None and self.ttl > 0 and generation == self._generation:
+                    self._cache[key] = (time.monotonic() + self.ttl, call.result)
+            call.event.set()
+        return call.result
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._calls.clear()
+            self._generation += 1
+
+
+_query_flight = _SingleFlight(ttl=NOTION_QUERY_CACHE_TTL_SEC)
+_data_source_ids: Dict[str, str] = {}
+_property_ids: Dict[str, Dict[str, str]] = {}
+# データソースごとの select / status プロパティの選択肢（プロパティ名 → 選択肢名のリスト）
+_property_options: Dict[str, Dict[str, List[str]]] = {}
+
+
+@traced("notion_client.query")
+def _query_data_source(data_source_id: str, tenant: Optional[Tenant] = None, **kwargs: Any) -> Dict[str, Any]:
+    """
+    data_sources.query の呼び出し口。フィルタ・ソート・データソースが同じ同時リクエストは
+    1 回の問い合わせにまとめ、同じ結果を返す（戻り値は共有されるので変更しないこと）。
+    データソースはテナントごとに別なので、テナントが違えばキーも違う。
+    """
+    tenant = tenant or _tenants.default
+    key = json.dumps({"data_source_id": data_source_id, **kwargs}, sort_keys=True, ensure_ascii=False)
+    return _query_flight.do(key, lambda: _call(tenant, lambda c: c.data_sources.query(data_source_id=data_source_id, **kwargs)))
+
+
+def invalidate_query_cache() -> None:
+    """
+    タスクを書き込んだあとに呼び、キャッシュ済みのクエリ結果を捨てる。
+    """
+    _query_flight.invalidate()
+
+
+@traced("notion_client.create_notion_task")
 def create_notion_task(
     title: str,
     due_date: Optional[date],
@@ -39,6 +225,7 @@ def create_notion_task(
         priority: "low" | "medium" | "high"
         notes: メモ（任意）
         source: "line" や "web" など、どこから来たタスクか
+        user_id: 書き込み先のテナントを決めるユーザー
 
     Returns:
         作成された Notion ページの ID（文字列）
@@ -106,50 +293,104 @@ def create_notion_task(
             }
         }
 
-    page = notion.pages.create(
-        parent={"database_id": NOTION_DATABASE_ID},
+    # ユーザー (RichText) - NOTION_USER_PROPERTY を設定したときだけ
+    if NOTION_USER_PROPERTY and user_id:
+        properties[NOTION_USER_PROPERTY] = {
+            "rich_text": [
+                {
+                    "text": {
+                        "content": user_id,
+                    }
+                }
+            ]
+        }
+
+    tenant = _tenant_for(user_id)
+    page = _call(tenant, lambda c: c.pages.create(
+        parent={"database_id": tenant.database_id},
         properties=properties,
-    )
+    ))
+    invalidate_query_cache()
 
     # page["id"] は "xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx" 形式
     return page["id"], page["url"]
 
-def _get_default_data_source_id(database_id: str) -> str:
+def _get_default_data_source_id(tenant: Tenant) -> str:
     """
-    指定したデータベースのデフォルトのデータソース ID を取得する。
+    テナントのタスク DB のデフォルトのデータソース ID を取得する。
 
     Args:
-        database_id: Notion データベースの ID
+        tenant: 対象のテナント
 
     Returns:
         デフォルトのデータソース ID
     """
-    database = notion.databases.retrieve(database_id=database_id)
+    # データソース ID は変わらないので、一度取得したら使い回す
+    database_id = tenant.database_id
+    cached = _data_source_ids.get(database_id)
+    if cached:
+        return cached
+
+    database = _call(tenant, lambda c: c.databases.retrieve(database_id=database_id))
     data_sources = database.get("data_sources", [])
     if not data_sources:
         raise RuntimeError("No data sources found for the database.")
+    _data_source_ids[database_id] = data_sources[0]["id"]
     return data_sources[0]["id"]
-    
-def query_tasks_due_before(
-    end_iso: str,
-    limit: int = 50,
-    exclude_done: bool = True,
-):
-    and_filters = [{"property": "Due", "date": {"on_or_before": end_iso}}]
-    if exclude_done:
-        and_filters.append({"property": "Status", "status": {"does_not_equal": "Done"}})
 
-    data_source_id = _get_default_data_source_id(NOTION_DATABASE_ID)
+def _projection(
+    data_source_id: str,
+    names: tuple = SUMMARY_PROPERTIES,
+    tenant: Optional[Tenant] = None,
+) -> Dict[str, Any]:
+    """
+    data_sources.query に渡す filter_properties を作る。
+    filter_properties はプロパティ ID で指定するので、名前 → ID の対応を一度だけ取得して使い回す。
 
-    resp = notion.data_sources.query(
-        data_source_id=data_source_id,
-        filter={"and": and_filters},
-        page_size=limit,
-        sorts=[{"property": "Due", "direction": "ascending"}],
-    )
-    return resp.get("results", [])
+    Args:
+        data_source_id: データソース ID
+        names: 返してほしいプロパティ名
+        tenant: データソースを持つテナント（None ならデフォルト）
+    Returns:
+        query にそのまま渡せる dict（無効時や ID が取れないときは空）
+    """
+    if not NOTION_PROPERTY_PROJECTION:
+        return {}
+
+    ids = _property_ids.get(data_source_id)
+    if ids is None:
+        _load_properties(data_source_id, tenant)
+        ids = _property_ids[data_source_id]
+
+    selected = [ids[name] for name in names if name in ids]
+    return {"filter_properties": selected} if selected else {}
 
-def query_task_candidates_for_dayly(end_iso: str, limit: int = 50):
+
+def _property_option_names(data_source_id: str, name: str, tenant: Optional[Tenant] = None) -> Optional[List[str]]:
+    """
+    select / status プロパティの選択肢名を返す。プロパティがない・選択式でないときは None。
+    """
+    options = _property_options.get(data_source_id)
+    if options is None:
+        _load_properties(data_source_id, tenant)
+        options = _property_options[data_source_id]
+    return options.get(name)
+
+
+def _load_properties(data_source_id: str, tenant: Optional[Tenant] = None) -> None:
+    """
+    データソースのスキーマを 1 回取得し、プロパティ名 → ID と、select / status の選択肢をキャッシュする。
+    """
+    data_source = _call(tenant or _tenants.default, lambda c: c.data_sources.retrieve(data_source_id=data_source_id))
+    properties = data_source.get("properties", {})
+    _property_ids[data_source_id] = {name: prop["id"] for name, prop in properties.items()}
+    _property_options[data_source_id] = {
+        name: [option["name"] for option in prop[prop["type"]].get("options", [])]
+        for name, prop in properties.items()
+        if prop.get("type") in ("select", "status")
+    }
+    
+def query_task_candidates_for_dayly(end_iso: str, limit: int = 50, user_id: Optional[str] = None):
     """
     デイリータスク通知用に、指定日時までのタスクを取得する。
     候補 = (Due が空) OR (Due <= end_iso)
@@ -158,6 +399,7 @@ def query_task_candidates_for_dayly(end_iso: str, limit: int = 50):
     Args:
         end_iso: 期限の上限（ISO 8601 形式文字列）
         limit: 取得するタスクの最大数
+        user_id: 読み出し先のテナントを決めるユーザー
     Returns:
         タスクのリスト（Notion のページオブジェクトのリスト）
     """
@@ -175,10 +417,12 @@ def query_task_candidates_for_dayly(end_iso: str, limit: int = 50):
         "date": {"on_or_before": end_iso}
     }
 
-    data_source_id = _get_default_data_source_id(NOTION_DATABASE_ID)
+    tenant = _tenant_for(user_id)
+    data_source_id = _get_default_data_source_id(tenant)
 
-    resp = notion.data_sources.query(
+    resp = _query_data_source(
         data_source_id=data_source_id,
+        tenant=tenant,
         filter={
             "and": [
                 not_done,
@@ -192,42 +436,221 @@ def query_task_candidates_for_dayly(end_iso: str, limit: int = 50):
         },
         page_size=limit,
         sorts=[{"property": "Due", "direction": "ascending"}],
+        **_projection(data_source_id, tenant=tenant),
     )
     return resp.get("results", [])
 
-def extract_task_summary(page: Dict[str, Any]) -> str:
+def query_tasks_page(
+    end_iso: str,
+    start_iso: Optional[str] = None,
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    user_id: Optional[str] = None,
+    page_size: int = 50,
+    start_cursor: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    期限が end_iso 以前のタスクを、条件をすべて Notion 側で絞り込んで 1 ページ分取得する。
+    Python 側で捨てる行がないので、Notion の next_cursor をそのまま続きの取得に使える。
+
+    Args:
+        end_iso: 期限の上限（ISO 8601 形式文字列）
+        start_iso: 期限の下限（None なら期限切れも含める）
+        status: ステータス名で絞り込む（None なら Done 以外）
+        category: カテゴリ名で絞り込む
+        user_id: 読み出し先のテナントを決め、NOTION_USER_PROPERTY があればそのユーザーで絞り込む
+        page_size: 1 ページの件数（Notion の上限は 100）
+        start_cursor: 前のページの next_cursor
+    Returns:
+        {"results": [...], "has_more": bool, "next_cursor": str | None}
+    Raises:
+        ValueError: デフォルトテナントのユーザーを指定したが、NOTION_USER_PROPERTY が未設定で絞り込めない。
+            または status / category が DB の選択肢にない（Notion に投げると validation_error になる）
+    """
+    tenant = _tenant_for(user_id)
+
+    and_filters: List[Dict[str, Any]] = [{"property": "Due", "date": {"on_or_before": end_iso}}]
+    if start_iso:
+        and_filters.append({"property": "Due", "date": {"on_or_after": start_iso}})
+    if status:
+        and_filters.append({"property": "Status", "status": {"equals": status}})
+    else:
+        and_filters.append({"property": "Status", "status": {"does_not_equal": "Done"}})
+    if category:
+        and_filters.append({"property": "Category", "select": {"equals": category}})
+    if user_id and NOTION_USER_PROPERTY:
+        and_filters.append({"property": NOTION_USER_PROPERTY, "rich_text": {"equals": user_id}})
+    elif user_id and tenant is _tenants.default:
+        # 専用テナントなら DB ごと分かれているが、デフォルトの DB では他のユーザーと区別できない
+        raise ValueError("Filtering by user requires NOTION_USER_PROPERTY to be set.")
+
+    data_source_id = _get_default_data_source_id(tenant)
+    for name, value in (("Status", status), ("Category", category)):
+        options = _property_option_names(data_source_id, name, tenant=tenant) if value else None
+        if options is not None and value not in options:
+            raise ValueError(f"Unknown {name.lower()}: {value} (one of: {', '.join(options)})")
+
+    kwargs: Dict[str, Any] = {"page_size": page_size, **_projection(data_source_id, tenant=tenant)}
+    if start_cursor:
+        kwargs["start_cursor"] = start_cursor
+    resp = _query_data_source(
+        data_source_id=data_source_id,
+        tenant=tenant,
+        filter={"and": and_filters},
+        sorts=[{"property": "Due", "direction": "ascending"}],
+        **kwargs,
+    )
+    return {
+        "results": resp.get("results", []),
+        "has_more": bool(resp.get("has_more")),
+        "next_cursor": resp.get("next_cursor") if resp.get("has_more") else None,
+    }
+
+def query_open_tasks(max_tasks: int = 1000, user_id: Optional[str] = None):
+    """
+    未完了（Status != Done）のタスクを期限の昇順で取得する。
+    期限が未設定のタスクも含む。Notion の 100 件制限を超える分はページングして取得する。
+
+    Args:
+        max_tasks: 取得するタスクの最大数
+        user_id: 読み出し先のテナントを決め、NOTION_USER_PROPERTY があればそのユーザーのタスクに絞り込む
+            （未設定のデフォルトテナントでは DB 全体が対象。複数ユーザーで共有するなら必ず設定すること）
+    Returns:
+        タスクのリスト（Notion のページオブジェクトのリスト）
+    """
+    tenant = _tenant_for(user_id)
+    data_source_id = _get_default_data_source_id(tenant)
+
+    not_done = {"property": "Status", "status": {"does_not_equal": "Done"}}
+    if user_id and NOTION_USER_PROPERTY:
+        task_filter: Dict[str, Any] = {"and": [
+            not_done,
+            {"property": NOTION_USER_PROPERTY, "rich_text": {"equals": user_id}},
+        ]}
+    else:
+        task_filter = not_done
+
+    results: List[Dict[str, Any]] = []
+    cursor: Optional[str] = None
+    while len(results) < max_tasks:
+        kwargs: Dict[str, Any] = {
+            "page_size": min(100, max_tasks - len(results)),
+            **_projection(data_source_id, tenant=tenant),
+        }
+        if cursor:
+            kwargs["start_cursor"] = cursor
+        resp = _query_data_source(
+            data_source_id=data_source_id,
+            tenant=tenant,
+            filter=task_filter,
+            sorts=[{"property": "Due", "direction": "ascending"}],
+            **kwargs,
+        )
+        results.extend(resp.get("results", []))
+        if not resp.get("has_more"):
+            break
+        cursor = resp.get("next_cursor")
+    return results
+
+def query_all_tasks(max_tasks: int = 5000, user_id: Optional[str] = None):
+    """
+    完了済みも含めて全タスクを取得する（分類器の学習用）。
+    Notion の 100 件制限を超える分はページングして取得する。
+
+    Args:
+        max_tasks: 取得するタスクの最大数
+        user_id: 読み出し先のテナントを決めるユーザー
+    Returns:
+        タスクのリスト（Notion のページオブジェクトのリスト）
+    """
+    tenant = _tenant_for(user_id)
+    data_source_id = _get_default_data_source_id(tenant)
+
+    results: List[Dict[str, Any]] = []
+    cursor: Optional[str] = None
+    while len(results) < max_tasks:
+        kwargs: Dict[str, Any] = {
+            "page_size": min(100, max_tasks - len(results)),
+            **_projection(data_source_id, tenant=tenant),
+        }
+        if cursor:
+            kwargs["start_cursor"] = cursor
+        resp = _query_data_source(data_source_id=data_source_id, tenant=tenant, **kwargs)
+        results.extend(resp.get("results", []))
+        if not resp.get("has_more"):
+            break
+        cursor = resp.get("next_cursor")
+    return results
+
+@traced("notion_client.update_task_status")
+def update_task_status(page_id: str, status: str = "Done", user_id: Optional[str] = None) -> None:
+    """
+    タスクのステータスを更新する（完了にするなど）。
+
+    Args:
+        page_id: Notion ページ ID
+        status: 新しいステータス名
+        user_id: ページを持つテナントを決めるユーザー
+    """
+    _call(_tenant_for(user_id), lambda c: c.pages.update(
+        page_id=page_id,
+        properties={"Status": {"status": {"name": status}}},
+    ))
+    invalidate_query_cache()
+
+@traced("notion_client.update_task_due")
+def update_task_due(page_id: str, due_date: Optional[date], user_id: Optional[str] = None) -> None:
     """
-    Notion のページオブジェクトからタスクの要約文字列を作成する。
+    タスクの期限を更新する。None なら期限を消す。
+
+    Args:
+        page_id: Notion ページ ID
+        due_date: 新しい期限
+        user_id: ページを持つテナントを決めるユーザー
+    """
+    _call(_tenant_for(user_id), lambda c: c.pages.update(
+        page_id=page_id,
+        properties={"Due": {"date": {"start": due_date.isoformat()} if due_date else None}},
+    ))
+    invalidate_query_cache()
+
+def extract_task_summary(page: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Notion のページオブジェクトからタスクの要約を作成する。
 
     Args:
         page: Notion API から取得したページオブジェクト
 
     Returns:
-        タスクの要約文字列
+        {"title", "due", "priority", "category", "status", "page_url", "page_id"}
     """
-    props = page.get("properties", {})
+    props = page.get("properties") or _EMPTY
 
-    def _title(prop_name: str) -> str:
-        title = props.get(prop_name, {}).get("title", [])
-        return (title[0]["text"]["content"] if title else "")
-    
-    def _select(prop_name: str) -> Optional[str]:
-        select = props.get(prop_name, {}).get("select")
-        return select.get("name") if select else None
-    
-    def _status(prop_name: str) -> Optional[str]:
-        status = props.get(prop_name, {}).get("status")
-        return status.get("name") if status else None
-    
-    def _date(prop_name: str) -> Optional[str]:
-        date_prop = props.get(prop_name, {}).get("date")
-        return date_prop.get("start") if date_prop else None
-    
     return {
-        "title": _title("Title"),
-        "due": _date("Due"),
-        "priority": _select("Priority"),
-        "status": _status("Status"),
+        "title": _title_of(props.get("Title")),
+        "due": _inner_of(props.get("Due"), "date", "start"),
+        "priority": _inner_of(props.get("Priority"), "select", "name"),
+        "category": _inner_of(props.get("Category"), "select", "name"),
+        "status": _inner_of(props.get("Status"), "status", "name"),
         "page_url": page.get("url"),
         "page_id": page.get("id"),
-    }
\ No newline at end of file
+    }
+
+
+_EMPTY: Dict[str, Any] = {}
+
+
+def _title_of(prop: Optional[Dict[str, Any]]) -> str:
+    if not prop:
+        return ""
+    title = prop.get("title")
+    return title[0]["text"]["content"] if title else ""
+
+def _inner_of(prop: Optional[Dict[str, Any]], kind: str, key: str) -> Optional[str]:
+    """
+    {"select": {"name": ...}} のような 2 段の値を取り出す。
+    """
+    if not prop:
+        return None
+    value = prop.get(kind)
+    return value.get(key) if value else None
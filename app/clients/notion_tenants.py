@@ -0,0 +1,126 @@
+"""
+ユーザー（またはチーム）ごとに、書き込み先の Notion インテグレーションとデータベースを振り分ける。
+
+Notion のレート制限はインテグレーション単位なので、テナントごとに別のトークン・クライアント・
+レート制限を持たせれば、全体のスループットはテナント数に比例して増やせる。
+
+NOTION_TENANTS_FILE に次の形式の JSON を置く（どのテナントにも属さないユーザーは
+NOTION_API_KEY / NOTION_DATABASE_ID のデフォルトテナントに入る）:
+
+    {
+      "tenants": [
+        {
+          "name": "lab",
+          "api_key_env": "NOTION_API_KEY_LAB",
+          "database_id": "xxxxxxxx",
+          "users": ["Uxxxxxxxx", "Uyyyyyyyy"],
+          "rate_limit_rps": 3
+        }
+      ]
+    }
+
+トークンはファイルに直接書かず、api_key_env で環境変数名を指定するのを推奨（api_key でも可）。
+"""
+import json
+import os
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from notion_client import Client
+
+from app.clients.circuit_breaker import CircuitBreaker
+from app.clients.rate_limiter import TokenBucket
+
+DEFAULT_TENANT = "default"
+
+
+@dataclass
+class Tenant:
+    """
+    Attributes:
+        name: テナント名（メトリクスのラベルにも使う）
+        database_id: タスク DB の ID
+        limiter: このインテグレーション専用のレート制限
+        breaker: このインテグレーション専用のサーキットブレーカー（障害は他のテナントに波及させない）
+        client: このインテグレーション専用のクライアント（接続はクライアントごとにプールされる）。
+            None ならデフォルトのクライアント（notion_client.notion）を使う
+    """
+
+    name: str
+    database_id: str
+    limiter: TokenBucket
+    breaker: CircuitBreaker
+    client: Optional[Client] = None
+
+
+class TenantRouter:
+    """
+    ユーザー ID からテナントを引く。
+    """
+
+    def __init__(self, default: Tenant, tenants: Optional[List[Tenant]] = None, users: Optional[Dict[str, str]] = None):
+        self.default = default
+        self._tenants = {t.name: t for t in tenants or []}
+        self._users = dict(users or {})
+
+    def tenant_for(self, user_id: Optional[str]) -> Tenant:
+        name = self._users.get(user_id) if user_id else None
+        return self._tenants.get(name, self.default) if name else self.default
+
+    @property
+    def tenants(self) -> List[Tenant]:
+        return [self.default, *self._tenants.values()]
+
+
+def load_tenants(
+    path: Optional[str],
+    default_database_id: str,
+    rate: float,
+    burst: float,
+    new_breaker: Callable[[str], CircuitBreaker] = CircuitBreaker,
+) -> TenantRouter:
+    """
+    テナント設定を読み込む。path が未指定ならデフォルトテナントだけのルーターを返す。
+
+    Args:
+        path: NOTION_TENANTS_FILE のパス
+        default_database_id: デフォルトテナントの DB ID
+        rate: テナントごとのレート制限（回/秒）の既定値
+        burst: テナントごとに連続で通せる回数の既定値
+        new_breaker: ブレーカー名を受け取り、テナント用のサーキットブレーカーを作る関数
+    Raises:
+        ValueError: トークンが見つからない・テナント名が重複している
+    """
+    default = Tenant(
+        DEFAULT_TENANT,
+        default_database_id,
+        TokenBucket(f"notion:{DEFAULT_TENANT}", rate, burst),
+        new_breaker(f"notion:{DEFAULT_TENANT}"),
+    )
+    if not path:
+        return TenantRouter(default)
+
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+
+    tenants: List[Tenant] = []
+    users: Dict[str, str] = {}
+    for entry in config.get("tenants", []):
+        name = entry["name"]
+        if name == DEFAULT_TENANT or any(t.name == name for t in tenants):
+            raise ValueError(f"Duplicate Notion tenant name: {name}")
+
+        api_key = entry.get("api_key") or os.getenv(entry.get("api_key_env", ""))
+        if not api_key:
+            raise ValueError(f"Notion tenant '{name}' has no api_key (set api_key or the {entry.get('api_key_env')} env var).")
+
+        limiter = TokenBucket(
+            f"notion:{name}",
+            float(entry.get("rate_limit_rps", rate)),
+            float(entry.get("rate_limit_burst", burst)),
+        )
+        tenants.append(Tenant(name, entry["database_id"], limiter, new_breaker(f"notion:{name}"), client=Client(auth=api_key)))
+        for user_id in entry.get("users", []):
+            users[user_id] = name
+
+    return TenantRouter(default, tenants, users)
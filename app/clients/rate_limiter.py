@@ -0,0 +1,51 @@
+import threading
+import time
+from typing import Optional
+
+from app.services import metrics
+
+
+class RateLimitExceeded(TimeoutError):
+    """
+    レート制限の待ち時間が上限を超えるため、呼び出さずに失敗させた。
+    """
+
+
+class TokenBucket:
+    """
+    トークンバケット方式のレート制限。平均 rate 回/秒、最大 burst 回まで連続で通す。
+
+    枠が足りないときはトークンを前借りして（残量がマイナスになる）その分だけ待つので、
+    待っている呼び出しは到着順に通る。
+    """
+
+    def __init__(self, name: str, rate: float, burst: float):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: Optional[float] = None) -> float:
+        """
+        1 回分の枠を取る。枠が空くまで待ち、待った秒数を返す。
+
+        Raises:
+            RateLimitExceeded: timeout 秒以内に枠が空かない
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if timeout is not None and wait > timeout:
+                metrics.inc("rate_limiter_rejected_total", limiter=self.name)
+                raise RateLimitExceeded(f"{self.name}: rate limit wait {wait:.2f}s exceeds {timeout}s")
+            self._tokens -= 1
+
+        metrics.observe("rate_limiter_wait_seconds", wait, limiter=self.name)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
@@ -1,11 +1,16 @@
+import asyncio
 import os
 import logging
 
 from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
 from linebot import LineBotApi, WebhookParser
 from linebot.models import MessageEvent, TextMessage, TextSendMessage, FlexSendMessage, BubbleContainer, BoxComponent, TextComponent, ButtonComponent, URIAction
 
-from app.services import task_service
+from app.models.task import Task
+from app.services import command_service, task_service
+from app.services.admission import AdmissionRejected, controller_from_env
+from app.services.micro_batcher import MicroBatcher
 
 load_dotenv()
 
@@ -20,15 +25,35 @@ if not CHANNEL_ACCESS_TOKEN:
 line_bot_api = LineBotApi(CHANNEL_ACCESS_TOKEN)
 parser = WebhookParser(CHANNEL_SECRET)
 
-from typing import Any, Dict, List
+# LINE メッセージ処理の同時実行数と待ち行列の上限（LINE_ADMISSION_* で上書き可）
+# LINE の Webhook はすぐ 200 を返したいので、待ち時間は短めにしておく
+line_admission = controller_from_env("line_webhook", "LINE_ADMISSION", max_wait_sec=2.0)
+
+BUSY_MESSAGE = "ただいま混雑しています🙏\n少し時間をおいて、もう一度送ってください。"
+# まとめて返信するときの、処理できなかったメッセージ 1 件分の文面
+BUSY_ITEM_MESSAGE = "混雑のため登録できませんでした：{text}\n少し時間をおいて、もう一度送ってください。"
+FAILED_ITEM_MESSAGE = "処理できませんでした：{text}"
+PENDING_MESSAGE = (
+    "受け付けました：{title}\n"
+    "Notion に接続できないため、復旧後に登録を試みます。\n"
+    "しばらくしても Notion に見当たらないときは、お手数ですがもう一度送ってください。"
+)
+
+# 同じユーザーから続けて届いたメッセージをまとめる待ち時間（ミリ秒）。0 ならまとめずに 1 件ずつ処理する
+LINE_BATCH_WINDOW_MS = int(os.getenv("LINE_BATCH_WINDOW_MS", "300"))
+# 1 回にまとめるメッセージの上限
+LINE_BATCH_MAX_MESSAGES = int(os.getenv("LINE_BATCH_MAX_MESSAGES", "10"))
+
+from typing import Any, Dict, Iterator, List, Optional
 from linebot.exceptions import InvalidSignatureError
 
 
-def handle_line_webhook(body: str, signature: str) -> None:
+async def handle_line_webhook(body: str, signature: str) -> None:
     """
     LINE Platform からの Webhook を処理するメイン関数。
     - 署名検証
-    - イベントごとの処理
+    - ユーザーごとに受付制御を通してから、メッセージの処理をスレッドに渡す
+      （順番待ちはイベントループ上で行い、待っている間はワーカースレッドを使わない）
     """
     try:
         events = parser.parse(body, signature)
@@ -37,32 +62,163 @@ def handle_line_webhook(body: str, signature: str) -> None:
         print("[ERROR] Invalid LINE signature.")
         return
 
+    # 同じ Webhook に入っている同じユーザーのメッセージは、まとめて 1 つのバッチに入れる
+    by_user: Dict[str, List[MessageEvent]] = {}
     for event in events:
         if isinstance(event, MessageEvent) and isinstance(event.message, TextMessage):
-            _handle_text_message(event)
+            by_user.setdefault(event.source.user_id, []).append(event)
         # ここに postback イベントなども将来足せる
 
+    # ユーザーごとの処理は並行に進め（まとめ処理の待ち時間がユーザーの数だけ積み重ならない）、
+    # すべて（返信まで）終わるまで待ってから 200 を返す。
+    # 応答後に処理を残さないので、Cloud Run の CPU をリクエスト中だけ割り当てる設定でも動く
+    await asyncio.gather(*(_handle_user_events(user_id, user_events) for user_id, user_events in by_user.items()))
+
+
+async def _handle_user_events(user_id: str, events: List[MessageEvent]) -> None:
+    """
+    1 ユーザー分のメッセージを処理する。失敗してもここで止め、同じ Webhook の他のユーザーの処理を巻き込まない。
+    """
+    try:
+        async with line_admission.admit(user_id):
+            await run_in_threadpool(_process_user_events, user_id, events)
+    except AdmissionRejected as e:
+        # 混雑時は重い処理をせず、すぐに「混雑中」とだけ返信する
+        print(f"[WARN] LINE messages from {user_id} rejected: {e}")
+        try:
+            await run_in_threadpool(line_bot_api.reply_message, events[0].reply_token, TextSendMessage(text=BUSY_MESSAGE))
+        except Exception as reply_error:
+            print(f"[ERROR] Failed to reply to {user_id}: {reply_error}")
+    except Exception as e:
+        print(f"[ERROR] Failed to handle {len(events)} LINE messages from {user_id}: {e}")
+
+
+def _process_user_events(user_id: str, events: List[MessageEvent]) -> None:
+    if line_batcher is not None:
+        line_batcher.process(user_id, events)
+    else:
+        for event in events:
+            _handle_text_message(event)
+
+
+def _handle_text_messages(user_id: str, events: List[MessageEvent]) -> None:
+    """
+    同じユーザーから window 内に届いたメッセージをまとめて処理し、最初のメッセージの reply token で 1 回だけ返信する。
+
+    - タスク文は先に 1 回の LLM 呼び出しでまとめて解析する（解析には副作用がない）
+    - 登録とコマンド（完了・期限変更）は送られた順に 1 件ずつ実行する（「X 完了」→「X」の順序を変えない）
+    - 1 件が失敗しても残りは処理し、返信にはメッセージごとの結果を入力順に並べる
+    """
+    if len(events) == 1:
+        _handle_text_message(events[0])
+        return
+
+    lines = _run_messages(user_id, [event.message.text for event in events])
+    line_bot_api.reply_message(events[0].reply_token, TextSendMessage(text="\n\n".join(lines)))
+
+
+def _run_messages(user_id: str, texts: List[str]) -> List[str]:
+    """
+    _handle_text_messages の本体。メッセージごとの返信文を入力順に返す。
+    """
+    commands = [command_service.parse_command(text) for text in texts]
+
+    task_texts = [text for text, command in zip(texts, commands) if command is None]
+    parsed_tasks: Optional[Iterator[Dict[str, Any]]] = None
+    if task_texts:
+        try:
+            parsed_tasks = iter(task_service.parse_task_texts(task_texts, source="line", user_id=user_id))
+        except Exception as e:
+            # 解析できなかったタスク文は下で 1 件ずつ「処理できませんでした」にする
+            print(f"[ERROR] Failed to parse {len(task_texts)} LINE messages from {user_id}: {e}")
+
+    lines: List[str] = []
+    for text, command in zip(texts, commands):
+        try:
+            if command is not None:
+                lines.append(command_service.execute_command(command, user_id=user_id).message)
+            elif parsed_tasks is None:
+                lines.append(FAILED_ITEM_MESSAGE.format(text=text))
+            else:
+                task = task_service.create_task_from_parsed(text, next(parsed_tasks), source="line", user_id=user_id)
+                lines.append(_format_task_line(task))
+        except AdmissionRejected as e:
+            # Notion の障害中で保留キューもいっぱいのとき
+            print(f"[WARN] LINE message from {user_id} rejected: {e}")
+            lines.append(BUSY_ITEM_MESSAGE.format(text=text))
+        except Exception as e:
+            print(f"[ERROR] Failed to handle LINE message from {user_id}: {e}")
+            lines.append(FAILED_ITEM_MESSAGE.format(text=text))
+    return lines
+
+
+def _format_task_line(task: Task) -> str:
+    """
+    まとめて返信するときのタスク 1 件分の文面。
+    """
+    if task.is_pending:
+        heading = "受け付けました（Notion 復旧後に登録を試みます。見当たらないときは再送してください）"
+    elif task.is_duplicate:
+        heading = "登録済みのタスクです"
+    else:
+        heading = "タスク登録しました"
+
+    line = f"{heading}：{task.title}"
+    if task.due_date:
+        line += f"（期限: {task.due_date}）"
+    if task.page_url:
+        line += f"\n{task.page_url}"
+    return line
+
 
 def _handle_text_message(event: MessageEvent) -> None:
     user_id = event.source.user_id
+
+    try:
+        command = command_service.parse_command(event.message.text)
+        if command:
+            _run_command_and_reply(event, command)
+        else:
+            _create_task_and_reply(event)
+    except AdmissionRejected as e:
+        # Notion の障害中で保留キューもいっぱいのとき
+        print(f"[WARN] LINE message from {user_id} rejected: {e}")
+        line_bot_api.reply_message(event.reply_token, TextSendMessage(text=BUSY_MESSAGE))
+
+
+def _run_command_and_reply(event: MessageEvent, command: command_service.Command) -> None:
+    """
+    「完了」「期限変更」など既存タスクへのコマンドを実行して結果を返信する。
+    """
+    result = command_service.execute_command(command, user_id=event.source.user_id)
+    line_bot_api.reply_message(event.reply_token, TextSendMessage(text=result.message))
+
+
+def _create_task_and_reply(event: MessageEvent) -> None:
+    user_id = event.source.user_id
     text = event.message.text
 
-    # とりあえず全部「タスク登録」として扱う（将来コマンド判定を追加）
     task = task_service.create_task_from_text(
         text=text,
         source="line",
         user_id=user_id,
     )
 
+    # Notion の障害中は保留しただけなので、開くページがまだない
+    if task.is_pending:
+        line_bot_api.reply_message(event.reply_token, TextSendMessage(text=PENDING_MESSAGE.format(title=task.title)))
+        return
+
     # 返信メッセージ作成
     # 期限があるなら表示
+    heading = "登録済みのタスクです" if task.is_duplicate else "タスク登録しました"
     flex = FlexSendMessage(
         alt_text="タスク登録",
         contents=BubbleContainer(
             body=BoxComponent(
                 layout="vertical",
                 contents=[
-                    TextComponent(text=f"タスク登録しました：{task.title}", wrap=True),
+                    TextComponent(text=f"{heading}：{task.title}", wrap=True),
                     TextComponent(text=f"期限: {task.due_date}", size="sm", color="#888888"),
                 ]
             ),
@@ -78,3 +234,15 @@ def _handle_text_message(event: MessageEvent) -> None:
     )
 
     line_bot_api.reply_message(event.reply_token, flex) 
+
+
+line_batcher = (
+    MicroBatcher(
+        "line",
+        window_sec=LINE_BATCH_WINDOW_MS / 1000,
+        handle_batch=_handle_text_messages,
+        max_batch=LINE_BATCH_MAX_MESSAGES,
+    )
+    if LINE_BATCH_WINDOW_MS > 0
+    else None
+)
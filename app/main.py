@@ -1,14 +1,28 @@
+from contextlib import asynccontextmanager
+
+import anyio.to_thread
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 import os
 import uvicorn
 
-from app.routers import line_webhook, tasks, daily
+from app.routers import line_webhook, tasks, daily, metrics, debug
+from app.services import admission, task_service, tracing
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 受付制御を通った処理だけでワーカースレッド（同期エンドポイント・run_in_threadpool 共通）を使い切らないか確かめる
+    admission.check_thread_capacity(anyio.to_thread.current_default_thread_limiter().total_tokens)
+    yield
+    # 保留中のタスクはメモリ上にしかないので、終了（Cloud Run のスケールイン）前に書き込みを試みる
+    await anyio.to_thread.run_sync(task_service.pending_tasks.flush_before_exit)
 
 
 app = FastAPI(
     title="SmartTaskParser API",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 
@@ -24,6 +38,28 @@ app.add_middleware(
 app.include_router(line_webhook.router)
 app.include_router(tasks.router)
 app.include_router(daily.router)
+app.include_router(metrics.router)
+app.include_router(debug.router)
+
+
+# PROFILING_TOKEN が設定されているときだけ、リクエスト単位のトレース用ミドルウェアを入れる
+# （未設定ならミドルウェア自体を登録しないので、通常リクエストへのコストはない）
+if tracing.PROFILING_TOKEN:
+    @app.middleware("http")
+    async def trace_requests(request: Request, call_next):
+        """
+        X-Debug-Token ヘッダーが PROFILING_TOKEN と一致するリクエストだけ span を記録し、
+        Server-Timing / X-Trace-Id ヘッダーを付けて返す。
+        """
+        if request.headers.get("X-Debug-Token") != tracing.PROFILING_TOKEN:
+            return await call_next(request)
+
+        trace = tracing.start_trace(f"{request.method} {request.url.path}")
+        response = await call_next(request)
+        tracing.finish_trace(trace)
+        response.headers["Server-Timing"] = trace.server_timing()
+        response.headers["X-Trace-Id"] = trace.trace_id
+        return response
 
 
 @app.get("/health")
@@ -5,3 +5,4 @@ class ParseAndCreateRequest(BaseModel):
     text: str
     source: str = "line"
     user_id: Optional[str] = None
+    allow_duplicate: bool = False  # True なら重複チェックをせずに登録する
@@ -12,3 +12,5 @@ class Task(BaseModel):
     user_id: Optional[str] = None
     page_id: Optional[str] = None  # Notion ページ ID
     page_url: Optional[str] = None  # Notion ページ URL
+    is_duplicate: bool = False  # 既存タスクの再送と判定され、新規登録しなかった
+    is_pending: bool = False  # Notion の障害中のため保留中。復旧後に登録を試みる（保証はない）
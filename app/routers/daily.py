@@ -1,3 +1,5 @@
+import os
+
 from fastapi import APIRouter, Header, HTTPException
 from app.services.task_service import get_daily_tasks_grouped
 from app.services.line_push_service import push_daily_summary, verify_cron_token
@@ -12,7 +14,8 @@ def daily_push(cron_token: str = Header(... , alias="X-Cron-Token")):
     """
     try:
         verify_cron_token(cron_token)
-        grouped_tasks = get_daily_tasks_grouped()
+        # 通知先ユーザーのテナント（設定がなければデフォルト）のタスクを集める
+        grouped_tasks = get_daily_tasks_grouped(user_id=os.getenv("LINE_USER_ID"))
         push_daily_summary(grouped_tasks)
         return {
             "ok": True,
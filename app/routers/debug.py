@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.services import profiler, tracing
+
+router = APIRouter()
+
+def _verify_token(token: str) -> None:
+    """
+    PROFILING_TOKEN が未設定なら機能ごと無効（404）、一致しなければ 401。
+    """
+    if not tracing.PROFILING_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if token != tracing.PROFILING_TOKEN:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+@router.post("/debug/profile", response_class=PlainTextResponse)
+def run_profile(
+    seconds: float = Query(10.0, gt=0, le=60),
+    interval_ms: float = Query(5.0, ge=1, le=100),
+    include_idle: bool = False,
+    token: str = Header("", alias="X-Debug-Token"),
+):
+    """
+    サンプリングプロファイラを seconds 秒間動かし、collapsed stack 形式で返す。
+    出力は flamegraph.pl や speedscope にそのまま渡せる。
+    """
+    _verify_token(token)
+    try:
+        return profiler.profile(seconds, interval_ms / 1000, include_idle)
+    except RuntimeError:
+        raise HTTPException(status_code=409, detail="Profiler is already running")
+
+@router.get("/debug/traces/{trace_id}")
+def get_trace(
+    trace_id: str,
+    format: str = Query("json", pattern="^(json|collapsed)$"),
+    token: str = Header("", alias="X-Debug-Token"),
+):
+    """
+    X-Debug-Token 付きで送ったリクエストのトレース（span ごとの所要時間）を返す。
+    format=collapsed なら flamegraph 用の collapsed stack 形式。
+    """
+    _verify_token(token)
+    trace = tracing.get_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    if format == "collapsed":
+        return PlainTextResponse(trace.to_collapsed())
+    return trace.to_dict()
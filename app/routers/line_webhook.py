@@ -33,7 +33,8 @@ async def line_webhook(request: Request):
     signature = request.headers.get("X-Line-Signature", "")
 
     try:
-        line_handlers.handle_line_webhook(body_str, signature)
+        # 受付制御を通ったメッセージだけ、Gemini / Notion 呼び出しをスレッドで処理する
+        await line_handlers.handle_line_webhook(body_str, signature)
     except InvalidSignatureError:
         # 本番用：署名がおかしい場合は 400
         print("[WARN] Invalid LINE signature")
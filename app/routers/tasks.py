@@ -1,26 +1,137 @@
-from fastapi import APIRouter, HTTPException
+import hashlib
+from typing import Any, Dict, Iterator, List, Literal, Optional
+
+import orjson
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from app.models.request import ParseAndCreateRequest
 from app.models.task import Task as TaskModel
-from app.services.task_service import create_task_from_text, get_tasks_within_next_n_days
+from app.services.admission import AdmissionRejected, controller_from_env
+from app.services.task_service import create_task_from_text, get_upcoming_tasks_page, iter_upcoming_tasks
 
 router = APIRouter()
 
+# /tasks/upcoming の fields で選べる項目（extract_task_summary のキー）
+TASK_FIELDS = ("title", "due", "priority", "category", "status", "page_url", "page_id")
+
+# /parse-and-create の同時実行数と待ち行列の上限（PARSE_ADMISSION_* で上書き可）
+parse_admission = controller_from_env("parse_and_create", "PARSE_ADMISSION")
+
 @router.post("/parse-and-create", response_model=TaskModel)
-def parse_and_create_task(req: ParseAndCreateRequest):
+async def parse_and_create_task(req: ParseAndCreateRequest, response: Response):
     """
     自然文テキストを解析し、タスクを作成して返すエンドポイント。
+    Notion の障害中は受け付けだけ行い、202 と is_pending=True を返す（復旧後に登録を試みるが、
+    保留はメモリ上なのでインスタンスが終了すると失われることがある。その場合はクライアントが再送する）。
+
+    受付の順番待ちはイベントループ上で行い、通ってから Gemini / Notion の呼び出しをスレッドに渡す
+    （待っているリクエストがワーカースレッドを占有しない）。
     """
     try:
-        task = create_task_from_text(
-            text=req.text,
-            source=req.source,
-            user_id=req.user_id,
-        )
+        async with parse_admission.admit(req.user_id):
+            task = await run_in_threadpool(
+                create_task_from_text,
+                text=req.text,
+                source=req.source,
+                user_id=req.user_id,
+                allow_duplicate=req.allow_duplicate,
+            )
+        if task.is_pending:
+            response.status_code = 202
         return task
+    except AdmissionRejected as e:
+        print(f"[WARN] /tasks/parse-and-create rejected: {e}")
+        raise HTTPException(
+            status_code=e.status_code,
+            detail="Too Many Requests" if e.status_code == 429 else "Service Unavailable",
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except Exception as e:
         print(f"[ERROR] /tasks/parse-and-create failed: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
-    
+
+
 @router.get("/tasks/upcoming")
-def get_upcoming_tasks():
-    return get_tasks_within_next_n_days(n_days=3, include_overdue=True)
\ No newline at end of file
+def get_upcoming_tasks(
+    request: Request,
+    n_days: int = Query(3, ge=0, le=366),
+    include_overdue: bool = True,
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    user: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
+    fields: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json",
+):
+    """
+    n_days 日以内に期限が来るタスクの一覧を返す。
+
+    - json: 1 ページ（limit 件）を配列で返す。続きがあれば X-Next-Cursor ヘッダーを付ける。
+      ETag を返すので、If-None-Match を付けてポーリングすれば変化がないときは 304 になる
+    - ndjson: cursor 以降のすべてのページを 1 行 1 タスクでストリームする（ETag なし）
+    - fields: "title,due" のようにカンマ区切りで返す項目を選ぶ
+    """
+    selected = _parse_fields(fields)
+    query = dict(
+        n_days=n_days,
+        include_overdue=include_overdue,
+        status=status,
+        category=category,
+        user_id=user,
+        cursor=cursor,
+    )
+
+    try:
+        if format == "ndjson":
+            tasks = iter_upcoming_tasks(page_size=limit, **query)
+            return StreamingResponse(_ndjson_lines(tasks, selected), media_type="application/x-ndjson")
+        tasks, next_cursor = get_upcoming_tasks_page(limit=limit, **query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"[ERROR] /tasks/upcoming failed: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    body = orjson.dumps([_select(task, selected) for task in tasks])
+    headers = {"ETag": _etag(body)}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+
+    if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in TASK_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return selected
+
+
+def _select(task: Dict[str, Any], selected: Optional[List[str]]) -> Dict[str, Any]:
+    return task if selected is None else {f: task.get(f) for f in selected}
+
+
+def _ndjson_lines(tasks: Iterator[Dict[str, Any]], selected: Optional[List[str]]) -> Iterator[bytes]:
+    for task in tasks:
+        yield orjson.dumps(_select(task, selected)) + b"\n"
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match（カンマ区切り・弱い比較）に etag が含まれるか。
+    """
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or any(c.removeprefix("W/") == etag for c in candidates)
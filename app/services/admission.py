@@ -0,0 +1,206 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, List, Optional
+
+from app.services import metrics
+
+# 受付制御の対象外（/health や /tasks/upcoming など）のために残しておくワーカースレッド数
+ADMISSION_RESERVED_THREADS = int(os.getenv("ADMISSION_RESERVED_THREADS", "8"))
+
+
+class AdmissionRejected(Exception):
+    """
+    キャパシティ超過でリクエストを受け付けられなかったときの例外。
+
+    Attributes:
+        status_code: 返すべき HTTP ステータス（ユーザー単位の上限なら 429、全体なら 503）
+        retry_after: 再試行までの目安（秒）
+    """
+
+    def __init__(self, message: str, status_code: int, retry_after: int = 1):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("future", "granted")
+
+    def __init__(self, future: "asyncio.Future[None]") -> None:
+        self.future = future
+        self.granted = False
+
+
+class AdmissionController:
+    """
+    エンドポイントごとの同時実行数と待ち行列を制限する。
+
+    - 実行中が max_in_flight 未満ならすぐ通す
+    - それ以外は待ち行列に入れ、空きが出たらユーザー単位のラウンドロビンで通す
+      （1 人が大量に送っても他のユーザーが後回しにならない）
+    - 待ち行列が max_queue を超えたら 503、1 ユーザーの待ちが max_queue_per_user を超えたら 429
+    - max_wait_sec 待っても順番が来なければ 503
+
+    待つのはイベントループ上（スレッドを使わない）。通ったあとで重い処理を run_in_threadpool に渡すので、
+    待ち行列がワーカースレッドを埋めて /health などまで詰まることはない。
+    イベントループからだけ使う（スレッドから呼ばない）。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_in_flight: int,
+        max_queue: int,
+        max_queue_per_user: int,
+        max_wait_sec: float,
+    ):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.max_wait_sec = max_wait_sec
+
+        self._in_flight = 0
+        self._queued = 0
+        # user_id -> 待ち行列。並び順がラウンドロビンの順番
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+
+    @asynccontextmanager
+    async def admit(self, user_id: Optional[str]) -> AsyncIterator[None]:
+        """
+        実行枠を 1 つ確保してから async with ブロックを実行する。
+
+        Raises:
+            AdmissionRejected: キャパシティ超過
+        """
+        await self._acquire(user_id or "anonymous")
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, user_id: str) -> None:
+        started = time.monotonic()
+
+        if self._in_flight < self.max_in_flight and self._queued == 0:
+            self._in_flight += 1
+            self._record(0.0, "admitted")
+            return
+
+        if self._queued >= self.max_queue:
+            self._record(0.0, "rejected_queue_full")
+            raise AdmissionRejected(f"{self.name}: queue is full", status_code=503)
+
+        user_queue = self._queues.get(user_id)
+        if user_queue is not None and len(user_queue) >= self.max_queue_per_user:
+            self._record(0.0, "rejected_user_limit")
+            raise AdmissionRejected(f"{self.name}: too many requests for user", status_code=429)
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future())
+        if user_queue is None:
+            user_queue = self._queues[user_id] = deque()
+        user_queue.append(waiter)
+        self._queued += 1
+        self._update_gauges()
+
+        try:
+            # wait() はタイムアウトしても future を取り消さないので、直前に通った場合も granted で判定できる
+            await asyncio.wait([waiter.future], timeout=self.max_wait_sec)
+        except asyncio.CancelledError:
+            # クライアントが切断した：枠をもらっていれば返し、まだなら待ち行列から外す
+            if waiter.granted:
+                self._release()
+            else:
+                self._remove(user_id, waiter)
+            raise
+
+        waited = time.monotonic() - started
+        if waiter.granted:
+            self._record(waited, "admitted")
+            return
+
+        self._remove(user_id, waiter)
+        self._record(waited, "rejected_timeout")
+        raise AdmissionRejected(f"{self.name}: timed out waiting in queue", status_code=503)
+
+    def _remove(self, user_id: str, waiter: _Waiter) -> None:
+        user_queue = self._queues.get(user_id)
+        if user_queue is not None:
+            user_queue.remove(waiter)
+            if not user_queue:
+                del self._queues[user_id]
+        self._queued -= 1
+        self._update_gauges()
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        while self._queues and self._in_flight < self.max_in_flight:
+            # 先頭のユーザーから 1 件取り出し、まだ残っていれば末尾に回す
+            user_id, user_queue = self._queues.popitem(last=False)
+            waiter = user_queue.popleft()
+            if user_queue:
+                self._queues[user_id] = user_queue
+            self._queued -= 1
+            self._in_flight += 1
+            waiter.granted = True
+            waiter.future.set_result(None)
+        self._update_gauges()
+
+    def _record(self, waited: float, outcome: str) -> None:
+        metrics.observe("admission_queue_wait_seconds", waited, endpoint=self.name)
+        metrics.inc("admission_requests_total", endpoint=self.name, outcome=outcome)
+        self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        metrics.set_gauge("admission_in_flight", self._in_flight, endpoint=self.name)
+        metrics.set_gauge("admission_queue_length", self._queued, endpoint=self.name)
+
+
+# controller_from_env で作ったエンドポイントの AdmissionController（check_thread_capacity 用）
+_controllers: List[AdmissionController] = []
+
+
+def check_thread_capacity(
+    total_threads: int,
+    reserved: int = ADMISSION_RESERVED_THREADS,
+    controllers: Optional[List[AdmissionController]] = None,
+) -> None:
+    """
+    受付制御を通った処理がすべてワーカースレッドを使っても、reserved 本は /health などのために残ることを確かめる。
+
+    Raises:
+        ValueError: 各エンドポイントの max_in_flight の合計 + reserved がスレッド数を超えている
+    """
+    controllers = _controllers if controllers is None else controllers
+    in_flight = sum(c.max_in_flight for c in controllers)
+    if in_flight + reserved > total_threads:
+        names = ", ".join(f"{c.name}={c.max_in_flight}" for c in controllers)
+        raise ValueError(
+            f"Admission max_in_flight total {in_flight} ({names}) + {reserved} reserved "
+            f"exceeds the {total_threads} worker threads."
+        )
+
+
+def controller_from_env(
+    name: str,
+    env_prefix: str,
+    max_in_flight: int = 8,
+    max_queue: int = 32,
+    max_queue_per_user: int = 4,
+    max_wait_sec: float = 5.0,
+) -> AdmissionController:
+    """
+    環境変数 {env_prefix}_MAX_IN_FLIGHT などで上書きできる AdmissionController を作る。
+    """
+    controller = AdmissionController(
+        name=name,
+        max_in_flight=int(os.getenv(f"{env_prefix}_MAX_IN_FLIGHT", max_in_flight)),
+        max_queue=int(os.getenv(f"{env_prefix}_MAX_QUEUE", max_queue)),
+        max_queue_per_user=int(os.getenv(f"{env_prefix}_MAX_QUEUE_PER_USER", max_queue_per_user)),
+        max_wait_sec=float(os.getenv(f"{env_prefix}_MAX_WAIT_SEC", max_wait_sec)),
+    )
+    _controllers.append(controller)
+    return controller
@@ -0,0 +1,124 @@
+import re
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from app.clients import notion_client
+from app.clients.local_parser import extract_due_date
+from app.services.task_service import flush_pending_tasks, load_title_index
+from app.services.title_index import title_index
+from app.services.tracing import traced
+
+# 「<タスク名> 完了」
+_COMPLETE_RE = re.compile(
+    r"^(?P<title>.+?)[\s　]+(?:完了|終わった|おわった|終了|済み|済|done)[!！。]*$",
+    re.IGNORECASE,
+)
+# 「<タスク名> <日付>に変更」
+_RESCHEDULE_RE = re.compile(
+    r"^(?P<title>.+?)[\s　]+(?P<when>\S+?)(?:に|へ)(?:変更|延期|変える|ずらす)[!！。]*$",
+)
+
+# タイトル照合で候補とみなす最低スコア（Dice 係数）
+MATCH_MIN_SCORE = 0.5
+# 確認なしで実行する最低スコア。これ未満、または 2 番目の候補との差が MATCH_MIN_MARGIN 未満なら、
+# 実行せずに候補を返して正確なタイトルで送り直してもらう（完了は取り消せないので、弱い一致では実行しない）
+MATCH_CONFIRM_SCORE = 0.7
+MATCH_MIN_MARGIN = 0.1
+
+NO_USER_SCOPE_MESSAGE = (
+    "この設定ではタスクがどのユーザーのものか区別できないため、「完了」「期限変更」は使えません。\n"
+    "Notion で直接変更してください。"
+)
+
+
+@dataclass
+class Command:
+    action: str  # "complete" | "reschedule"
+    title_query: str
+    due_date: Optional[date] = None
+
+
+@dataclass
+class CommandResult:
+    ok: bool
+    message: str
+    task: Optional[Dict[str, Any]] = None
+
+
+def parse_command(text: str, today: Optional[date] = None) -> Optional[Command]:
+    """
+    既存タスクへの操作コマンドか判定する。コマンドでなければ None（＝新規タスク）。
+
+    例:
+        「スライド直す 完了」 → complete
+        「買い物 明日に変更」 → reschedule
+    """
+    text = text.strip()
+
+    m = _COMPLETE_RE.match(text)
+    if m:
+        return Command(action="complete", title_query=m.group("title"))
+
+    m = _RESCHEDULE_RE.match(text)
+    if m:
+        due, _ = extract_due_date(m.group("when"), today=today)
+        if due:
+            return Command(action="reschedule", title_query=m.group("title"), due_date=due)
+
+    return None
+
+
+@traced("command_service.execute_command")
+def execute_command(command: Command, user_id: Optional[str]) -> CommandResult:
+    """
+    タイトルインデックスで対象タスクを特定し、Notion のページを 1 回だけ更新する。
+
+    - ユーザー列（NOTION_USER_PROPERTY）も専用テナントもなく、他のユーザーのタスクと区別できないときは実行しない
+    - 一致が弱い・候補が複数あって決めきれないときは実行せず、候補を返して送り直してもらう
+    """
+    if not notion_client.has_user_scope(user_id):
+        return CommandResult(ok=False, message=NO_USER_SCOPE_MESSAGE)
+
+    # 保留中のタスクを先に登録しておく（「X」を送った直後の「X 完了」でも対象が見つかるように）
+    flush_pending_tasks()
+    load_title_index(user_id)
+
+    matches = title_index.search(user_id, command.title_query, limit=3, min_score=MATCH_MIN_SCORE)
+    if not matches:
+        return CommandResult(ok=False, message=f"「{command.title_query}」に一致するタスクが見つかりませんでした")
+
+    best_score, task = matches[0]
+    # 同じタイトルのタスクが複数あるだけなら、送り直してもらっても区別できないので先頭の 1 件を対象にする
+    ambiguous = any(
+        best_score - score < MATCH_MIN_MARGIN and other["title"] != task["title"]
+        for score, other in matches[1:]
+    )
+    if best_score < MATCH_CONFIRM_SCORE or ambiguous:
+        return CommandResult(ok=False, message=_confirmation_message(command, [t for _, t in matches]))
+
+    if command.action == "complete":
+        notion_client.update_task_status(task["page_id"], "Done", user_id=user_id)
+        title_index.remove(user_id, task["page_id"])
+        return CommandResult(ok=True, message=f"完了にしました：{task['title']}", task=task)
+
+    if command.action == "reschedule":
+        notion_client.update_task_due(task["page_id"], command.due_date, user_id=user_id)
+        title_index.update(user_id, task["page_id"], due=command.due_date.isoformat())
+        task["due"] = command.due_date.isoformat()
+        return CommandResult(ok=True, message=f"期限を {command.due_date} に変更しました：{task['title']}", task=task)
+
+    raise ValueError(f"Unknown command action: {command.action}")
+
+
+def _confirmation_message(command: Command, candidates: List[Dict[str, Any]]) -> str:
+    """
+    対象を決めきれなかったときの返信。候補ごとに、そのまま送り直せるコマンド文を添える。
+    """
+    lines = [f"「{command.title_query}」に近いタスクが見つかりました。対象のタスクをそのまま送り直してください。"]
+    for task in candidates:
+        if command.action == "reschedule":
+            lines.append(f"・{task['title']} {command.due_date.month}/{command.due_date.day}に変更")
+        else:
+            lines.append(f"・{task['title']} 完了")
+    return "\n".join(lines)
@@ -6,6 +6,8 @@ import os
 from dotenv import load_dotenv
 from zoneinfo import ZoneInfo
 
+from app.services.tracing import traced
+
 load_dotenv()
 
 CHANNEL_SECRET = os.getenv("LINE_CHANNEL_SECRET")
@@ -107,6 +109,7 @@ def build_daily_summary(grouped: Dict[str, List[Dict[str, Any]]]) -> str:
 
     return "\n".join(lines)
 
+@traced("line_push_service.push_daily_summary")
 def push_daily_summary(grouped: Dict[str, List[Dict[str, Any]]]) -> None:
     """
     LINE ユーザーに日次タスクサマリーをプッシュ送信する。
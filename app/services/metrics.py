@@ -0,0 +1,121 @@
+import threading
+from typing import Dict, List, Tuple
+
+# ヒストグラムのバケット境界（秒）
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_LabelKey = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_counters: Dict[str, Dict[_LabelKey, float]] = {}
+_gauges: Dict[str, Dict[_LabelKey, float]] = {}
+_histograms: Dict[str, Dict[_LabelKey, List[float]]] = {}
+
+
+def _key(labels: Dict[str, str]) -> _LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1.0, **labels: str) -> None:
+    """
+    カウンタを加算する。
+    """
+    with _lock:
+        series = _counters.setdefault(name, {})
+        key = _key(labels)
+        series[key] = series.get(key, 0.0) + value
+
+
+def set_gauge(name: str, value: float, **labels: str) -> None:
+    """
+    ゲージに現在値をセットする。
+    """
+    with _lock:
+        _gauges.setdefault(name, {})[_key(labels)] = value
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    """
+    ヒストグラムに 1 件観測値を追加する。
+    値は [bucket ごとの件数..., +Inf の件数, 合計] の形で保持する。
+    """
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        key = _key(labels)
+        row = series.get(key)
+        if row is None:
+            row = series[key] = [0.0] * (len(DEFAULT_BUCKETS) + 2)
+        for i, bound in enumerate(DEFAULT_BUCKETS):
+            if value <= bound:
+                row[i] += 1
+        row[-2] += 1
+        row[-1] += value
+
+
+def reset() -> None:
+    """
+    すべてのメトリクスを消す（テスト用）。
+    """
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+
+
+def get_value(name: str, **labels: str) -> float:
+    """
+    カウンタ / ゲージの現在値を返す。ヒストグラムなら観測件数を返す。
+    """
+    key = _key(labels)
+    with _lock:
+        if name in _counters:
+            return _counters[name].get(key, 0.0)
+        if name in _gauges:
+            return _gauges[name].get(key, 0.0)
+        if name in _histograms:
+            row = _histograms[name].get(key)
+            return row[-2] if row else 0.0
+    return 0.0
+
+
+def _fmt_labels(key: _LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    inner = ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in pairs)
+    return "{" + inner + "}"
+
+
+def _escape_label_value(value: str) -> str:
+    """
+    Prometheus のテキスト形式に合わせて、ラベル値の \\ と " と改行をエスケープする。
+    """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus() -> str:
+    """
+    Prometheus のテキスト形式でメトリクスを出力する。
+    """
+    lines: List[str] = []
+    with _lock:
+        for name, series in sorted(_counters.items()):
+            lines.append(f"# TYPE {name} counter")
+            for key, value in series.items():
+                lines.append(f"{name}{_fmt_labels(key)} {value}")
+
+        for name, series in sorted(_gauges.items()):
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in series.items():
+                lines.append(f"{name}{_fmt_labels(key)} {value}")
+
+        for name, series in sorted(_histograms.items()):
+            lines.append(f"# TYPE {name} histogram")
+            for key, row in series.items():
+                for i, bound in enumerate(DEFAULT_BUCKETS):
+                    lines.append(f"{name}_bucket{_fmt_labels(key, (('le', str(bound)),))} {row[i]}")
+                lines.append(f"{name}_bucket{_fmt_labels(key, (('le', '+Inf'),))} {row[-2]}")
+                lines.append(f"{name}_count{_fmt_labels(key)} {row[-2]}")
+                lines.append(f"{name}_sum{_fmt_labels(key)} {row[-1]}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,86 @@
+import threading
+from typing import Callable, Dict, Generic, List, Optional, TypeVar
+
+from app.services import metrics
+
+T = TypeVar("T")
+
+
+class _Batch(Generic[T]):
+    __slots__ = ("items", "full", "done", "error")
+
+    def __init__(self) -> None:
+        self.items: List[T] = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class MicroBatcher(Generic[T]):
+    """
+    キー（ユーザー）ごとに、最初の呼び出しから window_sec 秒だけ後続をため、まとめて handle_batch に渡す。
+
+    - 続けて送られた短いメッセージを 1 回の処理にまとめ、外部 API の呼び出し回数を減らす
+    - その代わり、1 件目の処理は最大 window_sec 秒だけ遅れる
+    - max_batch 件たまったら、window を待たずにすぐ処理する
+
+    バッチは最初に process() を呼んだスレッドがそのまま処理し、後から加わった呼び出しは処理が終わるまで待つ。
+    どの呼び出しもバッチの処理が終わるまで戻らないので、処理がリクエストの外（応答後）で走ることはなく、
+    トレースも最初のリクエストに残る。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_sec: float,
+        handle_batch: Callable[[str, List[T]], None],
+        max_batch: int = 10,
+    ):
+        self.name = name
+        self.window_sec = window_sec
+        self.max_batch = max_batch
+        self._handle_batch = handle_batch
+
+        self._batches: Dict[str, _Batch[T]] = {}
+        self._lock = threading.Lock()
+
+    def process(self, key: str, items: List[T]) -> None:
+        """
+        items をキーのバッチに加え、そのバッチの処理が終わるまで待つ。
+
+        Raises:
+            handle_batch が送出した例外（同じバッチに加わった呼び出しすべてで送出する）
+        """
+        with self._lock:
+            batch = self._batches.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._batches[key] = _Batch()
+            batch.items.extend(items)
+            if len(batch.items) >= self.max_batch:
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.window_sec)
+            self._run(key, batch)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+
+    def _run(self, key: str, batch: _Batch[T]) -> None:
+        # 取り出したあとに届いたものは次のバッチになる
+        with self._lock:
+            if self._batches.get(key) is batch:
+                del self._batches[key]
+
+        metrics.inc("micro_batches_total", batcher=self.name)
+        metrics.inc("micro_batch_items_total", len(batch.items), batcher=self.name)
+        try:
+            self._handle_batch(key, batch.items)
+        except BaseException as e:
+            print(f"[ERROR] {self.name}: failed to handle a batch of {len(batch.items)} for {key}: {e}")
+            batch.error = e
+        finally:
+            batch.done.set()
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Optional
+
+from app.models.task import Task
+from app.services import metrics
+
+
+class PendingTaskQueue:
+    """
+    Notion の障害中に書き込めなかったタスクをメモリ上に保持し、復旧後に順に書き込む。
+
+    - 後続のリクエストが処理の最初に flush_if_due() を呼び、flush_interval 秒ごとに数件ずつ書き込みを試みる
+      （Cloud Run のように CPU がリクエスト中しか割り当てられない環境では、これが主な書き込みの機会になる）
+    - 常時 CPU がある環境向けに、バックグラウンドスレッドも flush_interval 秒ごとに書き込みを試みる
+    - 書き込みがまた障害（is_outage が True）で失敗したら、残りは次の機会に回す
+    - それ以外のエラーは再試行しても直らないので、ログに原文を残して捨てる
+
+    プロセスのメモリ上にしかないので、再起動・スケールインで失われる点に注意
+    （終了時に flush_before_exit() で書き込みを試み、残ったものはログに原文を残す）。
+    """
+
+    def __init__(
+        self,
+        write: Callable[[Task], None],
+        is_outage: Callable[[BaseException], bool],
+        flush_interval: float = 30.0,
+        max_size: int = 1000,
+    ):
+        self._write = write
+        self._is_outage = is_outage
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+
+        self._tasks: Deque[Task] = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._worker: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._tasks)
+
+    def enqueue(self, task: Task) -> None:
+        """
+        Raises:
+            OverflowError: 保留中のタスクが max_size 件に達している
+        """
+        with self._lock:
+            if len(self._tasks) >= self.max_size:
+                raise OverflowError(f"Pending task queue is full ({self.max_size}).")
+            if not self._tasks:
+                # 次の書き込み試行は、保留し始めてから flush_interval 秒後
+                self._last_flush = time.monotonic()
+            self._tasks.append(task)
+            metrics.set_gauge("pending_tasks", len(self._tasks))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="pending-tasks", daemon=True)
+                self._worker.start()
+
+    def flush(self, max_tasks: Optional[int] = None) -> int:
+        """
+        保留中のタスクを古い順に（最大 max_tasks 件）書き込み、書き込めた件数を返す。
+        """
+        with self._flush_lock:
+            return self._flush_locked(max_tasks)
+
+    def flush_if_due(self, max_tasks: Optional[int] = None) -> int:
+        """
+        前回の書き込み試行から flush_interval 秒以上たっていれば flush する（リクエストの処理中に呼ぶ）。
+        保留がない・ほかのスレッドが flush 中なら、待たずに 0 を返す。
+        """
+        if not len(self) or time.monotonic() - self._last_flush < self.flush_interval:
+            return 0
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            return self._flush_locked(max_tasks)
+        finally:
+            self._flush_lock.release()
+
+    def flush_before_exit(self, timeout: float = 8.0) -> None:
+        """
+        プロセスの終了前に timeout 秒まで書き込みを試み、書き込めなかったタスクは失われるのでログに原文を残す
+        （Cloud Run は SIGTERM から 10 秒で強制終了する）。
+        """
+        with self._flush_lock:
+            self._flush_locked(None, deadline=time.monotonic() + timeout)
+        with self._lock:
+            for task in self._tasks:
+                print(f"[ERROR] Lost pending task {task.title!r} from {task.user_id} (due {task.due_date})")
+                metrics.inc("pending_tasks_dropped_total")
+            self._tasks.clear()
+            metrics.set_gauge("pending_tasks", 0)
+
+    def _flush_locked(self, max_tasks: Optional[int], deadline: Optional[float] = None) -> int:
+        self._last_flush = time.monotonic()
+        written = 0
+        attempted = 0
+        while max_tasks is None or attempted < max_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            with self._lock:
+                if not self._tasks:
+                    break
+                task = self._tasks[0]
+            attempted += 1
+
+            try:
+                self._write(task)
+            except Exception as e:
+                if self._is_outage(e):
+                    break
+                print(f"[ERROR] Dropping pending task {task.title!r} from {task.user_id}: {e}")
+                metrics.inc("pending_tasks_dropped_total")
+            else:
+                written += 1
+
+            with self._lock:
+                self._tasks.popleft()
+                metrics.set_gauge("pending_tasks", len(self._tasks))
+
+        if written:
+            metrics.inc("pending_tasks_flushed_total", written)
+        return written
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush_if_due()
@@ -0,0 +1,61 @@
+import sys
+import threading
+import time
+from collections import Counter
+
+# 同時に 1 つだけ実行する
+_running = threading.Lock()
+
+# 待機中のスレッド（スレッドプールの待ち受けなど）とみなす末端フレームのファイル
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py", "thread.py")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})"
+
+
+def sample_stacks(seconds: float, interval: float = 0.005, include_idle: bool = False) -> Counter:
+    """
+    seconds 秒間、interval 秒ごとに全スレッド（自分以外）のスタックを採取し、スタックごとの出現回数を返す。
+    include_idle が False なら、待機中のスレッドは数えない。
+    """
+    counts: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    me = threading.get_ident()
+    names = {t.ident: t.name for t in threading.enumerate()}
+
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == me:
+                continue
+            if not include_idle and frame.f_code.co_filename.endswith(_IDLE_FILES):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, str(thread_id)))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+        if len(names) != threading.active_count():
+            names = {t.ident: t.name for t in threading.enumerate()}
+
+    return counts
+
+
+def profile(seconds: float, interval: float = 0.005, include_idle: bool = False) -> str:
+    """
+    サンプリングプロファイラを実行し、collapsed stack 形式（flamegraph.pl / speedscope 用）で返す。
+
+    Raises:
+        RuntimeError: すでに別のプロファイルが実行中
+    """
+    if not _running.acquire(blocking=False):
+        raise RuntimeError("Profiler is already running.")
+    try:
+        counts = sample_stacks(seconds, interval, include_idle)
+    finally:
+        _running.release()
+
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
@@ -0,0 +1,248 @@
+"""
+タスク文からカテゴリと優先度を推定するローカル分類器（文字 n-gram の多項ナイーブベイズ）。
+
+Notion のタスク履歴から学習してモデルファイルに保存しておくと、
+LLM にはタイトル・期限の抽出だけを任せられる。
+
+    # Notion の既存タスクから学習してモデルを保存
+    python -m app.services.task_classifier --out task_classifier.json.gz
+"""
+import argparse
+import gzip
+import json
+import math
+import os
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.clients.local_parser import guess_category, guess_priority
+from app.services.title_index import normalize_title
+
+TASK_CLASSIFIER_PATH = os.getenv("TASK_CLASSIFIER_PATH", "task_classifier.json.gz")
+# これ未満の確信度なら分類器の結果を使わない
+TASK_CLASSIFIER_MIN_CONFIDENCE = float(os.getenv("TASK_CLASSIFIER_MIN_CONFIDENCE", "0.5"))
+
+CATEGORIES = ("Research", "Job", "Private", "Classes", "Others")
+PRIORITIES = ("low", "medium", "high")
+
+
+def extract_features(text: str, n_min: int = 1, n_max: int = 3) -> List[str]:
+    """
+    正規化した文字列から n_min〜n_max 文字の n-gram を取り出す（重複あり）。
+    """
+    s = normalize_title(text)
+    features = []
+    for n in range(n_min, n_max + 1):
+        features.extend(s[i:i + n] for i in range(len(s) - n + 1))
+    return features
+
+
+class NaiveBayesClassifier:
+    """
+    多項ナイーブベイズ。学習時は件数だけを持ち、推論用の対数確率は読み込み時に計算する。
+    """
+
+    def __init__(
+        self,
+        classes: Sequence[str],
+        class_counts: Sequence[int],
+        feature_counts: Dict[str, List[int]],
+        alpha: float = 1.0,
+    ):
+        self.classes = list(classes)
+        self.class_counts = list(class_counts)
+        self.feature_counts = feature_counts
+        self.alpha = alpha
+        self._prepare()
+
+    @classmethod
+    def fit(
+        cls,
+        texts: Sequence[str],
+        labels: Sequence[str],
+        classes: Sequence[str],
+        min_count: int = 2,
+        alpha: float = 1.0,
+    ) -> "NaiveBayesClassifier":
+        """
+        学習する。出現回数が min_count 未満の n-gram はモデルサイズ削減のため捨てる。
+        """
+        index = {c: i for i, c in enumerate(classes)}
+        class_counts = [0] * len(classes)
+        counts: Dict[str, List[int]] = {}
+
+        for text, label in zip(texts, labels):
+            if label not in index:
+                continue
+            k = index[label]
+            class_counts[k] += 1
+            for feature in extract_features(text):
+                row = counts.get(feature)
+                if row is None:
+                    row = counts[feature] = [0] * len(classes)
+                row[k] += 1
+
+        pruned = {f: row for f, row in counts.items() if sum(row) >= min_count}
+        return cls(classes, class_counts, pruned, alpha=alpha)
+
+    def _prepare(self) -> None:
+        n_classes = len(self.classes)
+        total_docs = sum(self.class_counts) or 1
+        vocab = len(self.feature_counts) or 1
+
+        totals = [0] * n_classes
+        for row in self.feature_counts.values():
+            for k, c in enumerate(row):
+                totals[k] += c
+
+        # 事前確率（件数 0 のクラスも選べるよう平滑化）
+        self._log_prior = [
+            math.log((self.class_counts[k] + self.alpha) / (total_docs + self.alpha * n_classes))
+            for k in range(n_classes)
+        ]
+        denominators = [math.log(totals[k] + self.alpha * vocab) for k in range(n_classes)]
+        self._log_unseen = [math.log(self.alpha) - denominators[k] for k in range(n_classes)]
+        self._log_likelihood = {
+            f: [math.log(row[k] + self.alpha) - denominators[k] for k in range(n_classes)]
+            for f, row in self.feature_counts.items()
+        }
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """
+        (クラス, 確信度) を返す。確信度は事後確率 (0〜1)。
+        """
+        scores = list(self._log_prior)
+        for feature in extract_features(text):
+            row = self._log_likelihood.get(feature)
+            if row is None:
+                continue
+            for k, v in enumerate(row):
+                scores[k] += v
+
+        best = max(range(len(scores)), key=scores.__getitem__)
+        top = scores[best]
+        norm = sum(math.exp(s - top) for s in scores)
+        return self.classes[best], 1.0 / norm
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "classes": self.classes,
+            "class_counts": self.class_counts,
+            "feature_counts": self.feature_counts,
+            "alpha": self.alpha,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "NaiveBayesClassifier":
+        return cls(d["classes"], d["class_counts"], d["feature_counts"], alpha=d.get("alpha", 1.0))
+
+
+class TaskClassifier:
+    """
+    カテゴリ用・優先度用の 2 つの分類器をまとめたもの。
+    """
+
+    def __init__(self, category: NaiveBayesClassifier, priority: NaiveBayesClassifier):
+        self.category = category
+        self.priority = priority
+
+    def predict(
+        self,
+        text: str,
+        min_confidence: float = TASK_CLASSIFIER_MIN_CONFIDENCE,
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        (category, priority) を返す。確信度が低いものは None。
+        """
+        category, c_conf = self.category.predict(text)
+        priority, p_conf = self.priority.predict(text)
+        return (
+            category if c_conf >= min_confidence else None,
+            priority if p_conf >= min_confidence else None,
+        )
+
+    @classmethod
+    def fit(cls, tasks: Sequence[Dict[str, Any]]) -> "TaskClassifier":
+        """
+        extract_task_summary() 形式（title, category, priority を含む）のタスクから学習する。
+        """
+        with_category = [t for t in tasks if t.get("category") in CATEGORIES]
+        with_priority = [t for t in tasks if t.get("priority") in PRIORITIES]
+        return cls(
+            category=NaiveBayesClassifier.fit(
+                [t["title"] for t in with_category], [t["category"] for t in with_category], CATEGORIES
+            ),
+            priority=NaiveBayesClassifier.fit(
+                [t["title"] for t in with_priority], [t["priority"] for t in with_priority], PRIORITIES
+            ),
+        )
+
+    def save(self, path: str) -> None:
+        payload = {"version": 1, "category": self.category.to_dict(), "priority": self.priority.to_dict()}
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "TaskClassifier":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+        return cls(
+            category=NaiveBayesClassifier.from_dict(payload["category"]),
+            priority=NaiveBayesClassifier.from_dict(payload["priority"]),
+        )
+
+
+_classifier: Optional[TaskClassifier] = None
+_loaded = False
+
+
+def get_classifier() -> Optional[TaskClassifier]:
+    """
+    TASK_CLASSIFIER_PATH のモデルを読み込んで返す（初回のみ読み込み）。
+    モデルファイルがなければ None（＝従来どおり LLM に分類させる）。
+    """
+    global _classifier, _loaded
+    if not _loaded:
+        if os.path.exists(TASK_CLASSIFIER_PATH):
+            _classifier = TaskClassifier.load(TASK_CLASSIFIER_PATH)
+        _loaded = True
+    return _classifier
+
+
+def classify_task(title: str, classifier: TaskClassifier, due_date: Optional[date] = None) -> Tuple[str, str]:
+    """
+    分類器で (category, priority) を決める。確信度が低いときは、カテゴリはキーワード判定、
+    優先度は期限までの日数（guess_priority）で決める。
+
+    Args:
+        title: タスクのタイトル（分類器はタイトルで学習しているので、元の文ではなくタイトルを渡す）
+        classifier: 学習済みの分類器
+        due_date: タスクの期限
+    """
+    category, priority = classifier.predict(title)
+    return category or guess_category(title), priority or guess_priority(due_date)
+
+
+# ----------------------------
+# 学習スクリプト
+# ----------------------------
+def main(argv: Optional[List[str]] = None) -> None:
+    from app.clients import notion_client
+
+    p = argparse.ArgumentParser(description="Notion のタスク履歴からカテゴリ・優先度分類器を学習する")
+    p.add_argument("--out", default=TASK_CLASSIFIER_PATH)
+    p.add_argument("--max-tasks", type=int, default=5000)
+    args = p.parse_args(argv)
+
+    pages = notion_client.query_all_tasks(max_tasks=args.max_tasks)
+    tasks = [notion_client.extract_task_summary(page) for page in pages]
+    model = TaskClassifier.fit(tasks)
+    model.save(args.out)
+
+    print(f"Trained on {len(tasks)} tasks "
+          f"({len(model.category.feature_counts)} category / {len(model.priority.feature_counts)} priority features). "
+          f"Saved to {args.out} ({os.path.getsize(args.out)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,120 @@
+import os
 from datetime import date, datetime, timedelta, time
 from zoneinfo import ZoneInfo
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Iterator, List, Tuple
 
 from app.clients import llm_client, notion_client
 from app.models.task import Task
+from app.services import task_classifier
+from app.services.admission import AdmissionRejected
+from app.services.pending_tasks import PendingTaskQueue
+from app.services.tracing import traced
+from app.services.title_index import title_index
 
 JST = ZoneInfo("Asia/Tokyo")
 
+# この値以上タイトルが似ていて期限も同じなら、同じタスクの再送とみなす
+DUPLICATE_MIN_JACCARD = float(os.getenv("DUPLICATE_MIN_JACCARD", "0.6"))
+
+# Notion の障害中に保留したタスクを書き込み直す間隔（秒）と、保留できる最大件数
+NOTION_PENDING_FLUSH_SEC = float(os.getenv("NOTION_PENDING_FLUSH_SEC", "30"))
+NOTION_PENDING_MAX_TASKS = int(os.getenv("NOTION_PENDING_MAX_TASKS", "1000"))
+# 後続のリクエストの処理中に、ついでに書き込み直す保留タスクの最大件数（応答が遅れすぎないように）
+NOTION_PENDING_FLUSH_PER_REQUEST = int(os.getenv("NOTION_PENDING_FLUSH_PER_REQUEST", "5"))
+
+# タイトルインデックス（重複チェック・コマンド用）を Notion から読み込み直す間隔（秒）と、読み込む最大件数
+TITLE_INDEX_TTL_SEC = float(os.getenv("TITLE_INDEX_TTL_SEC", "300"))
+TITLE_INDEX_MAX_TASKS = int(os.getenv("TITLE_INDEX_MAX_TASKS", "1000"))
+# タスクの持ち主を区別できない DB で、全ユーザーが共有するタイトルインデックスのキー（LINE のユーザー ID とは重ならない）
+SHARED_TITLE_INDEX_KEY = "*shared*"
+
+# NDJSON で一度にストリームするタスクの上限
+UPCOMING_STREAM_MAX_TASKS = int(os.getenv("UPCOMING_STREAM_MAX_TASKS", "5000"))
+
+@traced("task_service.create_task_from_text")
 def create_task_from_text(
     text: str,
     source: str = "line",
     user_id: Optional[str] = None,
+    allow_duplicate: bool = False,
 ) -> Task:
     """
     自然文のテキストからタスクを生成し、Notion に登録したうえで Task を返す。
 
     フロー:
       1. llm_client.parse_task_text() で JSON にパース
+         （分類器モデルがあればカテゴリ・優先度は task_classifier で判定）
       2. JSON から Task モデルを組み立て
-      3. notion_client.create_notion_task() で Notion に保存
-      4. 保存した内容を表す Task を返す
+      3. 未完了タスクにほぼ同じもの（タイトルが近く期限も同じ）があれば、
+         Notion に書かずにそのタスクを is_duplicate=True で返す
+      4. notion_client.create_notion_task() で Notion に保存
+         （Notion の障害中は保留キューに入れ、is_pending=True で返す。後続のリクエストで書き込み直す）
+      5. 保存した内容を表す Task を返す
     """
 
     # 1. LLM でタスク情報を抽出
-    parsed = llm_client.parse_task_text(text)
+    #    学習済みの分類器があれば、カテゴリ・優先度はローカルで決めて LLM には聞かない
+    classifier = task_classifier.get_classifier()
+    parsed = llm_client.parse_task_text(
+        text,
+        classify=classifier is None,
+        user_id=user_id,
+        endpoint=source,
+    )
+
+    return _create_task(text, parsed, classifier, source, user_id, allow_duplicate)
+
+
+@traced("task_service.parse_task_texts")
+def parse_task_texts(
+    texts: List[str],
+    source: str = "line",
+    user_id: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    複数のテキストを 1 回の LLM 呼び出しでまとめて解析する（Notion にはまだ書かない）。
+    結果は 1 件ずつ create_task_from_parsed() に渡して登録する。
+    解析と登録を分けておけば、間にコマンドなどを挟んでも入力順に処理でき、1 件の失敗が他を巻き込まない。
+
+    Returns:
+        texts と同じ順番の解析結果のリスト
+    """
+    classifier = task_classifier.get_classifier()
+    return llm_client.parse_multiple_tasks(
+        texts,
+        classify=classifier is None,
+        user_id=user_id,
+        endpoint=source,
+    )
+
+
+@traced("task_service.create_task_from_parsed")
+def create_task_from_parsed(
+    text: str,
+    parsed: Dict[str, Any],
+    source: str = "line",
+    user_id: Optional[str] = None,
+    allow_duplicate: bool = False,
+) -> Task:
+    """
+    parse_task_texts() の結果 1 件から Task を組み立て、重複チェックのうえ Notion に登録する。
+    """
+    return _create_task(text, parsed, task_classifier.get_classifier(), source, user_id, allow_duplicate)
+
+
+def _create_task(
+    text: str,
+    parsed: Dict[str, Any],
+    classifier: Optional[task_classifier.TaskClassifier],
+    source: str,
+    user_id: Optional[str],
+    allow_duplicate: bool,
+) -> Task:
+    """
+    LLM の抽出結果から Task を組み立て、重複チェックのうえ Notion に登録する（create_task_from_text の 2. 以降）。
+    """
+    # 保留中のタスクがあれば、新しいタスクより先に書き込み直す
+    flush_pending_tasks()
 
     title = parsed.get("title") or text
     due_date_str = parsed.get("due_date")
@@ -34,6 +125,10 @@ def create_task_from_text(
     # 2. 文字列の日付を date 型に変換（不正なら None）
     due_date: Optional[date] = _parse_date_str(due_date_str)
 
+    # 分類器があれば、LLM には聞いていないカテゴリ・優先度をタイトルと期限から決める
+    if classifier is not None:
+        category, priority = task_classifier.classify_task(title, classifier, due_date=due_date)
+
     # 3. アプリ内部で扱う Task モデルを組み立て
     task = Task(
         title=title,
@@ -45,7 +140,57 @@ def create_task_from_text(
         category=category,
     )
 
-    # 4. Notion に保存
+    # 4. 重複チェック（インデックス上で完結するので Notion にはアクセスしない）
+    #    タスクの持ち主を区別できない DB では、他のユーザーのタスクを重複とみなしてしまうのでチェックしない
+    user_key = user_id or "anonymous"
+    if not allow_duplicate and notion_client.has_user_scope(user_id):
+        index_key = title_index_key(user_id)
+        try:
+            load_title_index(index_key)
+        except Exception as e:
+            # Notion の障害中は重複チェックを諦めて登録（保留）を優先する
+            if not notion_client.is_outage_error(e):
+                raise
+            print(f"[WARN] Skipping duplicate check for {user_key}: {e}")
+        existing = title_index.find_duplicate(
+            index_key,
+            task.title,
+            task.due_date.isoformat() if task.due_date else None,
+            min_jaccard=DUPLICATE_MIN_JACCARD,
+        )
+        if existing:
+            task.title = existing["title"]
+            task.page_id = existing["page_id"]
+            task.page_url = existing["page_url"]
+            task.is_duplicate = True
+            return task
+
+    # 5. Notion に保存（障害中なら保留キューへ）
+    try:
+        _save_to_notion(task)
+    except Exception as e:
+        if not notion_client.is_outage_error(e):
+            raise
+        try:
+            pending_tasks.enqueue(task)
+        except OverflowError:
+            # 保留もできないときは黙って捨てず、混雑中として再送してもらう
+            print(f"[ERROR] Pending queue is full. Rejected task from {user_key}: {task.title!r}")
+            raise AdmissionRejected(
+                "Notion is unavailable and the pending queue is full.",
+                status_code=503,
+                retry_after=int(NOTION_PENDING_FLUSH_SEC),
+            ) from e
+        print(f"[WARN] Notion is unavailable. Queued task from {user_key}: {e}")
+        task.is_pending = True
+
+    return task
+
+
+def _save_to_notion(task: Task) -> None:
+    """
+    Task を Notion に書き込み、page_id / page_url を埋めてタイトルインデックスに追加する。
+    """
     page_id, page_url = notion_client.create_notion_task(
         title=task.title,
         due_date=task.due_date,
@@ -57,8 +202,65 @@ def create_task_from_text(
     )
     task.page_id = page_id
     task.page_url = page_url
+    task.is_pending = False
+
+    # コマンド・重複チェック用のタイトルインデックスに追加（未読み込みなら、次の読み込みで Notion から入る）
+    index_key = title_index_key(task.user_id)
+    if not title_index.is_loaded(index_key):
+        return
+    title_index.add(index_key, {
+        "title": task.title,
+        "due": task.due_date.isoformat() if task.due_date else None,
+        "priority": task.priority,
+        "category": task.category,
+        "status": "ToDo",
+        "page_url": page_url,
+        "page_id": page_id,
+    })
+
+
+# Notion の障害中に受け付けたタスク（入力を失わないよう、復旧後にバックグラウンドで書き込む）
+pending_tasks = PendingTaskQueue(
+    write=_save_to_notion,
+    is_outage=notion_client.is_outage_error,
+    flush_interval=NOTION_PENDING_FLUSH_SEC,
+    max_size=NOTION_PENDING_MAX_TASKS,
+)
+
+
+def flush_pending_tasks() -> int:
+    """
+    前回から NOTION_PENDING_FLUSH_SEC 秒以上たっていれば、保留中のタスクを数件だけ Notion に書き込み直す。
+    CPU がリクエスト中しか割り当てられない環境（Cloud Run）ではバックグラウンドスレッドが動かないので、
+    リクエストの処理中に呼んで書き込みの機会を作る。
+
+    Returns:
+        書き込めた件数
+    """
+    return pending_tasks.flush_if_due(max_tasks=NOTION_PENDING_FLUSH_PER_REQUEST)
 
-    return task
+
+def title_index_key(user_id: Optional[str]) -> str:
+    """
+    タイトルインデックスのキー。タスクの持ち主を区別できない DB（ユーザー列のないデフォルト DB）のタスクは、
+    ユーザーごとに同じものを読み込まないよう、全員で SHARED_TITLE_INDEX_KEY の 1 つを共有する。
+    """
+    return user_id if notion_client.has_user_scope(user_id) else SHARED_TITLE_INDEX_KEY
+
+
+def load_title_index(user_key: str) -> None:
+    """
+    title_index_key() のインデックスが未読み込み、または TITLE_INDEX_TTL_SEC 秒より古ければ、
+    Notion から未完了タスクを読み込む（Notion 上で直接編集された分もここで反映される）。
+    共有キーなら DB 全体、それ以外はそのユーザーのタスクだけを読む。
+    """
+    if title_index.is_loaded(user_key, max_age=TITLE_INDEX_TTL_SEC):
+        return
+    pages = notion_client.query_open_tasks(
+        max_tasks=TITLE_INDEX_MAX_TASKS,
+        user_id=None if user_key == SHARED_TITLE_INDEX_KEY else user_key,
+    )
+    title_index.load(user_key, [notion_client.extract_task_summary(page) for page in pages])
 
 
 def _parse_date_str(s: Optional[str]) -> Optional[date]:
@@ -91,43 +293,90 @@ def _parse_due_iso(due_iso: Optional[str]) -> Optional[datetime]:
     except ValueError:
         return None
     
-def get_tasks_within_next_n_days(
+def _upcoming_window(n_days: int, include_overdue: bool) -> Tuple[str, Optional[str]]:
+    """
+    今日から n_days 日後の終わりまでの期間を (end_iso, start_iso) で返す。
+    include_overdue なら start_iso は None（下限なし）。
+    """
+    now = datetime.now(JST)
+    today_start = datetime.combine(now.date(), time(0, 0, 0), tzinfo=JST)
+    end_date = datetime.combine((now.date() + timedelta(days=n_days)), time(23, 59, 59), tzinfo=JST)
+    return end_date.isoformat(), None if include_overdue else today_start.isoformat()
+
+@traced("task_service.get_upcoming_tasks_page")
+def get_upcoming_tasks_page(
         n_days: int = 3,
         limit: int = 50,
         include_overdue: bool = True,
-    ) -> List[Dict[str, Any]]:
+        status: Optional[str] = None,
+        category: Optional[str] = None,
+        user_id: Optional[str] = None,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
     """
-    今から n_days 日以内に期限が来るタスク一覧を取得する。
-    include_overdue が True の場合、期限切れタスクも含める。
+    今から n_days 日以内に期限が来るタスクを 1 ページ分取得する。
+    絞り込みはすべて Notion 側で行う。
     Args:
         n_days: 期限が来るまでの日数
-        limit: 取得するタスクの最大数
+        limit: 1 ページの件数（最大 100）
         include_overdue: 期限切れタスクを含めるかどうか
+        status: ステータスで絞り込む（None なら Done 以外）
+        category: カテゴリで絞り込む
+        user_id: ユーザーで絞り込む
+        cursor: 前のページで返した next_cursor
     Returns:
-        タスクのリスト（Notion のページオブジェクトのリスト）
+        (タスクの要約のリスト, 次ページのカーソル。最後のページなら None)
     """
-    now = datetime.now(JST)
-    today_start = datetime.combine(now.date(), time(0, 0, 0), tzinfo=JST)
-    end_date = datetime.combine((now.date() + timedelta(days=n_days)), time(23, 59, 59), tzinfo=JST)
+    end_iso, start_iso = _upcoming_window(n_days, include_overdue)
+    resp = notion_client.query_tasks_page(
+        end_iso=end_iso,
+        start_iso=start_iso,
+        status=status,
+        category=category,
+        user_id=user_id,
+        page_size=limit,
+        start_cursor=cursor,
+    )
+    return [notion_client.extract_task_summary(page) for page in resp["results"]], resp["next_cursor"]
 
-    # Notion側で Due<= end まで絞り、Python で最終判定
-    pages = notion_client.query_tasks_due_before(end_iso=end_date.isoformat(), limit=limit, exclude_done=True)
-    tasks = [notion_client.extract_task_summary(page) for page in pages]
+def iter_upcoming_tasks(
+        n_days: int = 3,
+        page_size: int = 100,
+        include_overdue: bool = True,
+        status: Optional[str] = None,
+        category: Optional[str] = None,
+        user_id: Optional[str] = None,
+        cursor: Optional[str] = None,
+        max_tasks: int = UPCOMING_STREAM_MAX_TASKS,
+    ) -> Iterator[Dict[str, Any]]:
+    """
+    get_upcoming_tasks_page() のページを順にたどり、タスクを 1 件ずつ返すイテレーターを作る。
+    最初のページだけはここで取得するので、条件の誤り（ValueError）はストリーム開始前に分かる。
+    """
+    kwargs = dict(n_days=n_days, limit=page_size, include_overdue=include_overdue,
+                  status=status, category=category, user_id=user_id)
+    first_page = get_upcoming_tasks_page(cursor=cursor, **kwargs)
 
-    filtered: List[Dict[str, Any]] = []
-    for task in tasks:
-        due_dt = _parse_due_iso(task.get("due"))
-        if not due_dt:
-            filtered.append(task)
-            continue
-        if due_dt <= end_date and (include_overdue or due_dt >= today_start):
-            filtered.append(task)
+    def _iter() -> Iterator[Dict[str, Any]]:
+        tasks, next_cursor = first_page
+        sent = 0
+        while True:
+            for task in tasks:
+                if sent >= max_tasks:
+                    return
+                yield task
+                sent += 1
+            if not next_cursor:
+                return
+            tasks, next_cursor = get_upcoming_tasks_page(cursor=next_cursor, **kwargs)
 
-    return filtered
+    return _iter()
 
+@traced("task_service.get_daily_tasks_grouped")
 def get_daily_tasks_grouped(
         n_days: int = 3,
         limit: int = 50,
+        user_id: Optional[str] = None,
     ) -> Dict[str, List[Dict[str, Any]]]:
     """
     デイリータスク通知用に、今から n_days 日以内に期限が来るタスクを日付ごとにグルーピングして取得する。
@@ -135,6 +384,7 @@ def get_daily_tasks_grouped(
     Args:
         n_days: 期限が来るまでの日数
         limit: 取得するタスクの最大数
+        user_id: 読み出し先のテナントを決めるユーザー
     Returns:
         {"orverdue": [...], "today": [...], "no_due":[...], "upcoming": [...]}
     """
@@ -143,7 +393,7 @@ def get_daily_tasks_grouped(
     today_end = datetime.combine(now.date(), time(23, 59, 59), tzinfo=JST)
     end_date = datetime.combine((now.date() + timedelta(days=n_days)), time(23, 59, 59), tzinfo=JST)
 
-    pages = notion_client.query_task_candidates_for_dayly(end_iso=end_date.isoformat(), limit=limit)
+    pages = notion_client.query_task_candidates_for_dayly(end_iso=end_date.isoformat(), limit=limit, user_id=user_id)
     tasks = [notion_client.extract_task_summary(page) for page in pages]
 
     overdue: List[Dict[str, Any]] = []
@@ -0,0 +1,203 @@
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+_IGNORED_CHARS_RE = re.compile(r"[\s、。,.!！?？・:：「」『』()（）\[\]【】]+")
+
+
+def normalize_title(title: str) -> str:
+    """
+    比較用にタイトルを正規化する（全角/半角統一・小文字化・空白と記号の除去）。
+    """
+    title = unicodedata.normalize("NFKC", title).lower()
+    return _IGNORED_CHARS_RE.sub("", title)
+
+
+def char_ngrams(title: str, n: int = 2) -> FrozenSet[str]:
+    """
+    正規化済みタイトルの文字 n-gram 集合を返す。n 文字未満ならタイトルそのもの 1 つ。
+    """
+    if len(title) < n:
+        return frozenset([title]) if title else frozenset()
+    return frozenset(title[i:i + n] for i in range(len(title) - n + 1))
+
+
+class _UserIndex:
+    __slots__ = ("tasks", "grams", "postings", "loaded_at")
+
+    def __init__(self) -> None:
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.grams: Dict[str, FrozenSet[str]] = {}
+        self.postings: Dict[str, Set[str]] = {}
+        self.loaded_at: Optional[float] = None
+
+
+class TitleIndex:
+    """
+    ユーザーごとの未完了タスクタイトルの文字 n-gram 転置インデックス。
+
+    - Notion から読み込み (load)、以降はタスク作成・完了のたびに差分更新する
+    - Notion 上で直接編集された分は差分更新では拾えないので、呼び出し側が一定時間ごとに読み込み直す
+    - search は転置リストから候補を集めて Dice 係数で順位付けするので、
+      タスク数百件程度なら 1 ms もかからない
+    """
+
+    def __init__(self, n: int = 2):
+        self.n = n
+        self._users: Dict[str, _UserIndex] = {}
+        self._lock = threading.Lock()
+
+    def _user(self, user_id: str) -> _UserIndex:
+        index = self._users.get(user_id)
+        if index is None:
+            index = self._users[user_id] = _UserIndex()
+        return index
+
+    def is_loaded(self, user_id: str, max_age: Optional[float] = None) -> bool:
+        """
+        読み込み済みか。max_age を指定すると、読み込みから max_age 秒を過ぎたものは未読み込みとみなす。
+        """
+        with self._lock:
+            index = self._users.get(user_id)
+            if not index or index.loaded_at is None:
+                return False
+            return max_age is None or time.monotonic() - index.loaded_at < max_age
+
+    def load(self, user_id: str, tasks: Iterable[Dict[str, Any]]) -> None:
+        """
+        extract_task_summary() 形式のタスクでユーザーのインデックスを置き換え、読み込み済みにする。
+        """
+        index = _UserIndex()
+        for task in tasks:
+            self._add_locked(index, task)
+        index.loaded_at = time.monotonic()
+        with self._lock:
+            self._users[user_id] = index
+
+    def add(self, user_id: str, task: Dict[str, Any]) -> None:
+        """
+        タスクを 1 件登録する（同じ page_id があれば置き換える）。
+        """
+        with self._lock:
+            self._add_locked(self._user(user_id), task)
+
+    def remove(self, user_id: str, page_id: str) -> None:
+        """
+        タスクを 1 件削除する（完了時など）。
+        """
+        with self._lock:
+            index = self._users.get(user_id)
+            if index:
+                self._remove_locked(index, page_id)
+
+    def update(self, user_id: str, page_id: str, **fields: Any) -> None:
+        """
+        タスクの title 以外の項目（due など）を更新する。
+        """
+        with self._lock:
+            index = self._users.get(user_id)
+            if index and page_id in index.tasks:
+                index.tasks[page_id].update(fields)
+
+    def search(
+        self,
+        user_id: str,
+        query: str,
+        limit: int = 3,
+        min_score: float = 0.3,
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        クエリに近いタイトルのタスクを (スコア, タスク) のリストで返す（スコア降順）。
+        スコアは n-gram 集合の Dice 係数 (0〜1)。
+        """
+        q_grams = char_ngrams(normalize_title(query), self.n)
+        if not q_grams:
+            return []
+
+        with self._lock:
+            index = self._users.get(user_id)
+            if not index:
+                return []
+
+            scored = []
+            for page_id, overlap in self._overlaps_locked(index, q_grams).items():
+                score = 2 * overlap / (len(q_grams) + len(index.grams[page_id]))
+                if score >= min_score:
+                    scored.append((score, dict(index.tasks[page_id])))
+
+        scored.sort(key=lambda x: x[0], reverse=True)
+        return scored[:limit]
+
+    def find_duplicate(
+        self,
+        user_id: str,
+        title: str,
+        due: Optional[str],
+        min_jaccard: float = 0.6,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        タイトルの n-gram Jaccard 係数が min_jaccard 以上で、期限も同じタスクを返す。
+        候補は転置リストから引くので、未完了タスクの件数にほぼ依存しない。
+        """
+        q_grams = char_ngrams(normalize_title(title), self.n)
+        if not q_grams:
+            return None
+
+        best: Optional[Tuple[float, Dict[str, Any]]] = None
+        with self._lock:
+            index = self._users.get(user_id)
+            if not index:
+                return None
+
+            for page_id, overlap in self._overlaps_locked(index, q_grams).items():
+                task = index.tasks[page_id]
+                # Notion の期限は日時付きのこともあるので日付部分だけ比べる
+                if (task.get("due") or "")[:10] != (due or "")[:10]:
+                    continue
+                jaccard = overlap / (len(q_grams) + len(index.grams[page_id]) - overlap)
+                if jaccard >= min_jaccard and (best is None or jaccard > best[0]):
+                    best = (jaccard, dict(task))
+
+        return best[1] if best else None
+
+    def best_match(self, user_id: str, query: str, min_score: float = 0.3) -> Optional[Dict[str, Any]]:
+        results = self.search(user_id, query, limit=1, min_score=min_score)
+        return results[0][1] if results else None
+
+    def _overlaps_locked(self, index: _UserIndex, q_grams: FrozenSet[str]) -> Dict[str, int]:
+        """
+        クエリの n-gram を共有するタスクごとに、共有している n-gram 数を数える。
+        """
+        overlaps: Dict[str, int] = {}
+        for gram in q_grams:
+            for page_id in index.postings.get(gram, ()):
+                overlaps[page_id] = overlaps.get(page_id, 0) + 1
+        return overlaps
+
+    def _add_locked(self, index: _UserIndex, task: Dict[str, Any]) -> None:
+        page_id = task.get("page_id")
+        if not page_id:
+            return
+        if page_id in index.tasks:
+            self._remove_locked(index, page_id)
+
+        grams = char_ngrams(normalize_title(task.get("title") or ""), self.n)
+        index.tasks[page_id] = dict(task)
+        index.grams[page_id] = grams
+        for gram in grams:
+            index.postings.setdefault(gram, set()).add(page_id)
+
+    def _remove_locked(self, index: _UserIndex, page_id: str) -> None:
+        index.tasks.pop(page_id, None)
+        for gram in index.grams.pop(page_id, ()):
+            ids = index.postings.get(gram)
+            if ids is not None:
+                ids.discard(page_id)
+                if not ids:
+                    del index.postings[gram]
+
+
+# アプリ全体で共有するインデックス
+title_index = TitleIndex()
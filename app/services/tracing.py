@@ -0,0 +1,147 @@
+import functools
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# 設定されているときだけトレース・プロファイラを有効にする（未設定なら一切計測しない）
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+# 保持しておく直近のトレース数
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "50"))
+
+
+class Trace:
+    """
+    1 リクエスト分の計測結果。span はスレッドをまたいで追加される。
+    """
+
+    def __init__(self, name: str):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def new_span_id(self) -> int:
+        with self._lock:
+            self._next_id += 1
+            return self._next_id
+
+    def add_span(self, span_id: int, name: str, parent_id: Optional[int], start: float, end: float, error: bool) -> None:
+        with self._lock:
+            self.spans.append({
+                "id": span_id,
+                "parent_id": parent_id,
+                "name": name,
+                "start_ms": round((start - self.started) * 1000, 3),
+                "duration_ms": round((end - start) * 1000, 3),
+                "thread": threading.current_thread().name,
+                "error": error,
+            })
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"trace_id": self.trace_id, "name": self.name, "spans": sorted(self.spans, key=lambda s: s["start_ms"])}
+
+    def to_collapsed(self) -> str:
+        """
+        flamegraph.pl / speedscope が読める collapsed stack 形式（"親;子 自己時間[µs]"）で出力する。
+        """
+        with self._lock:
+            spans = {s["id"]: s for s in self.spans}
+        child_total: Dict[int, float] = {}
+        for s in spans.values():
+            if s["parent_id"] in spans:
+                child_total[s["parent_id"]] = child_total.get(s["parent_id"], 0.0) + s["duration_ms"]
+
+        lines = []
+        for s in spans.values():
+            path = [s["name"]]
+            parent = spans.get(s["parent_id"])
+            while parent is not None:
+                path.append(parent["name"])
+                parent = spans.get(parent["parent_id"])
+            # hedge などで子が並列に走ると自己時間が負になるので 0 で止める
+            self_us = max(0, int((s["duration_ms"] - child_total.get(s["id"], 0.0)) * 1000))
+            lines.append(f"{';'.join(reversed(path))} {self_us}")
+        return "\n".join(lines) + "\n"
+
+    def server_timing(self) -> str:
+        """
+        Server-Timing ヘッダー用の文字列（ブラウザの DevTools で見られる）。
+        """
+        with self._lock:
+            return ", ".join(
+                f'{s["name"].replace(".", "_")};dur={s["duration_ms"]}' for s in self.spans
+            )
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[int]] = ContextVar("current_span", default=None)
+
+_recent: "OrderedDict[str, Trace]" = OrderedDict()
+_recent_lock = threading.Lock()
+
+
+def start_trace(name: str) -> Trace:
+    """
+    現在のコンテキストでトレースを開始する。以降の traced 関数が span を記録する。
+    """
+    trace = Trace(name)
+    _current_trace.set(trace)
+    _current_span.set(None)
+    return trace
+
+
+def finish_trace(trace: Trace) -> None:
+    """
+    トレースを直近バッファに保存する（/debug/traces/{trace_id} で取得できる）。
+    """
+    with _recent_lock:
+        _recent[trace.trace_id] = trace
+        while len(_recent) > TRACE_BUFFER_SIZE:
+            _recent.popitem(last=False)
+
+
+def get_trace(trace_id: str) -> Optional[Trace]:
+    with _recent_lock:
+        return _recent.get(trace_id)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """
+    関数の実行時間を span として記録するデコレーター。
+    トレース中でなければ ContextVar を 1 回読むだけで、そのまま関数を呼ぶ。
+    """
+
+    def decorator(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            trace = _current_trace.get()
+            if trace is None:
+                return fn(*args, **kwargs)
+
+            parent_id = _current_span.get()
+            span_id = trace.new_span_id()
+            token = _current_span.set(span_id)
+            start = time.perf_counter()
+            error = False
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                error = True
+                raise
+            finally:
+                end = time.perf_counter()
+                _current_span.reset(token)
+                trace.add_span(span_id, name, parent_id, start, end, error)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
@@ -0,0 +1,29 @@
+import json
+import random
+
+from linebot import WebhookParser
+
+from benchmarks.line_webhook_load import Result, compute_signature, summarize, synthesize_body
+
+
+def test_synthesized_body_passes_webhook_signature_check():
+    secret = "test-channel-secret"
+    body = synthesize_body(n_users=3, rng=random.Random(0))
+
+    events = WebhookParser(secret).parse(body, compute_signature(body, secret))
+
+    assert len(events) == 1
+    assert events[0].message.text == json.loads(body)["events"][0]["message"]["text"]
+
+
+def test_busy_replies_count_as_shed_not_throughput():
+    results = [
+        Result("5rps", 0.0, 0.1, 200),
+        Result("5rps", 1.0, 0.1, 200, busy=True),
+        Result("5rps", 2.0, 0.1, 503),
+    ]
+
+    step = summarize(results, [], knee_factor=2.0)["steps"][0]
+
+    assert step["shed"] == 2
+    assert step["throughput_rps"] == 0.5
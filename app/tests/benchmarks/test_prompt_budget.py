@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+from app.clients import llm_client
+from app.services import metrics
+from benchmarks.prompt_tokens import find_regressions, load_baseline, measure_static_prompts
+
+
+def test_static_prompts_stay_within_budget():
+    baseline = load_baseline()
+
+    problems = find_regressions(measure_static_prompts(), baseline["static_chars"], baseline["tolerance"])
+
+    assert problems == [], "プロンプトを伸ばした場合は python -m benchmarks.prompt_tokens --update-baseline"
+
+
+def test_record_token_usage_counts_per_user_and_endpoint():
+    metrics.reset()
+    response = SimpleNamespace(
+        usage_metadata=SimpleNamespace(prompt_token_count=120, candidates_token_count=30, total_token_count=150)
+    )
+
+    llm_client.record_token_usage(response, "m", user="U1", endpoint="line")
+    llm_client.record_token_usage(response, "m", user="U1", endpoint="line")
+
+    assert metrics.get_value("llm_calls_total", model="m", user="U1", endpoint="line") == 2
+    assert metrics.get_value("llm_tokens_total", kind="prompt", model="m", user="U1", endpoint="line") == 240
+    assert metrics.get_value("llm_tokens_total", kind="response", model="m", user="U1", endpoint="line") == 60
+
+
+def test_usage_label_does_not_expose_the_user_id():
+    label = llm_client.usage_user_label("U4af4980629")
+
+    assert "U4af4980629" not in label
+    assert label == llm_client.usage_user_label("U4af4980629")
+    assert llm_client.usage_user_label(None) == "anonymous"
+
+
+def test_endpoint_label_is_limited_to_known_sources():
+    assert llm_client.usage_endpoint_label("line") == "line"
+    assert llm_client.usage_endpoint_label("web") == "web"
+    assert llm_client.usage_endpoint_label("my-script-42") == "other"
+    assert llm_client.usage_endpoint_label(None) == "other"
+
+
+def test_label_values_are_escaped_in_exposition():
+    metrics.reset()
+    metrics.inc("llm_calls_total", model="m", endpoint='x"}\nevil 1')
+
+    exposition = metrics.render_prometheus()
+
+    assert 'llm_calls_total{endpoint="x\\"}\\nevil 1",model="m"} 1.0' in exposition
+    assert "\nevil" not in exposition
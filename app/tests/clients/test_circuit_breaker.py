@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+from app.clients.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def _fail(breaker: CircuitBreaker, error: Exception = RuntimeError("down")) -> None:
+    with pytest.raises(type(error)):
+        with breaker.guard():
+            raise error
+
+
+def test_opens_after_consecutive_failures_and_fails_fast():
+    breaker = CircuitBreaker("test", failure_threshold=3, recovery_timeout=60)
+
+    for _ in range(3):
+        _fail(breaker)
+
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        with breaker.guard():
+            pytest.fail("must not be called while open")
+
+
+def test_non_failure_errors_do_not_open():
+    breaker = CircuitBreaker("test", failure_threshold=1, is_failure=lambda e: not isinstance(e, ValueError))
+
+    _fail(breaker, ValueError("bad input"))
+
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_closes_or_reopens():
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.05)
+    _fail(breaker)
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+
+    _fail(breaker)
+    assert breaker.state == OPEN
+
+    time.sleep(0.06)
+    with breaker.guard():
+        pass
+    assert breaker.state == CLOSED
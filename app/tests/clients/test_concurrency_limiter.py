@@ -0,0 +1,45 @@
+import pytest
+
+from app.clients.concurrency_limiter import AdaptiveLimiter
+from app.services import metrics
+
+
+class Overloaded(Exception):
+    pass
+
+
+def _limiter(**kwargs):
+    return AdaptiveLimiter(
+        "test", initial_limit=4, max_limit=8, is_overload=lambda e: isinstance(e, Overloaded), **kwargs
+    )
+
+
+def test_limit_halves_on_overload_and_is_exported():
+    limiter = _limiter()
+
+    with pytest.raises(Overloaded):
+        with limiter.acquire():
+            raise Overloaded()
+
+    assert limiter.limit == 2
+    assert metrics.get_value("concurrency_limit", limiter="test") == 2
+
+
+def test_limit_grows_while_saturated_and_latency_is_stable():
+    limiter = _limiter()
+    limiter._in_flight = 3  # 上限近くまで使っている状態にする
+
+    for _ in range(20):
+        with limiter.acquire():
+            pass
+
+    assert limiter.limit > 4
+
+
+def test_acquire_times_out_when_full():
+    limiter = _limiter()
+    limiter._in_flight = limiter.limit
+
+    with pytest.raises(TimeoutError):
+        with limiter.acquire(timeout=0.05):
+            pass
@@ -0,0 +1,103 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from google.api_core import exceptions as api_exceptions
+
+from app.clients import llm_client
+from app.clients.concurrency_limiter import AdaptiveLimiter
+
+
+class _OverloadedModel:
+    calls = 0
+
+    def __init__(self, model_name, *args, **kwargs):
+        pass
+
+    def generate_content(self, prompt, request_options):
+        # 実際の SDK と同じく、渡された Retry で呼び出しを包む
+        def _call():
+            _OverloadedModel.calls += 1
+            raise api_exceptions.ResourceExhausted("Resource has been exhausted")
+
+        return request_options["retry"](_call)()
+
+
+def test_429_is_not_retried_inside_the_slot_and_lowers_the_limit(monkeypatch):
+    limiter = AdaptiveLimiter("gemini-test", initial_limit=8, is_overload=llm_client._is_overload_error)
+    monkeypatch.setattr(llm_client, "_limiter", limiter)
+    monkeypatch.setattr(llm_client.genai, "GenerativeModel", _OverloadedModel)
+
+    with pytest.raises(api_exceptions.ResourceExhausted):
+        llm_client._generate("gemini-test", "prompt", timeout=5)
+
+    assert _OverloadedModel.calls == 1
+    assert limiter.limit == 4
+
+
+def test_retry_error_wrapping_a_429_counts_as_overload():
+    cause = api_exceptions.ResourceExhausted("Resource has been exhausted")
+
+    assert llm_client._is_overload_error(api_exceptions.RetryError("Timeout of 5.0s exceeded", cause))
+
+
+def test_breaker_counts_only_outages():
+    assert llm_client._is_outage_error(api_exceptions.ServiceUnavailable("unavailable"))
+    assert llm_client._is_outage_error(api_exceptions.DeadlineExceeded("deadline"))
+    assert llm_client._is_outage_error(ConnectionResetError())
+    assert not llm_client._is_outage_error(api_exceptions.InvalidArgument("bad prompt"))
+    assert not llm_client._is_outage_error(api_exceptions.ResourceExhausted("quota"))
+
+
+class _BatchModel:
+    """
+    build_batch_prompt の番号付きの行ごとにタスクを返す偽の Gemini。drop 件だけ少なく返せる。
+    """
+
+    prompts = []
+    drop = 0
+
+    def __init__(self, model_name, *args, **kwargs):
+        pass
+
+    def generate_content(self, prompt, request_options):
+        _BatchModel.prompts.append(prompt)
+        lines = prompt.split("# 入力（", 1)[1].strip().splitlines()[1:]
+        items = [{"title": line.split(". ", 1)[1], "due_date": None, "notes": None} for line in lines]
+        return SimpleNamespace(text=json.dumps(items[_BatchModel.drop:], ensure_ascii=False), usage_metadata=None)
+
+
+@pytest.fixture
+def batch_model(monkeypatch):
+    monkeypatch.setattr(llm_client.genai, "GenerativeModel", _BatchModel)
+    monkeypatch.setattr(_BatchModel, "prompts", [])
+    monkeypatch.setattr(_BatchModel, "drop", 0)
+    return _BatchModel
+
+
+def test_build_batch_prompt_numbers_each_text_on_one_line():
+    prompt = llm_client.build_batch_prompt(["スライド直す", "メール\n送る"], classify=False)
+
+    assert "# 入力（2 件）\n1. スライド直す\n2. メール 送る" in prompt
+    assert '"category"' not in prompt
+
+
+def test_parse_multiple_tasks_uses_one_call(batch_model):
+    tasks = llm_client.parse_multiple_tasks(["スライド直す", "メール送る"], classify=False)
+
+    assert [t["title"] for t in tasks] == ["スライド直す", "メール送る"]
+    assert len(batch_model.prompts) == 1
+
+
+def test_count_mismatch_falls_back_to_local_parse(batch_model):
+    batch_model.drop = 1
+
+    with pytest.raises(ValueError):
+        llm_client._decode_tasks('[{"title": "a"}]', expected=2)
+
+    tasks = llm_client.parse_multiple_tasks(["明日スライド直す", "メール送る"], deadline=1, classify=False)
+
+    assert [t["title"] for t in tasks] == [
+        llm_client.parse_task_text_locally("明日スライド直す")["title"],
+        llm_client.parse_task_text_locally("メール送る")["title"],
+    ]
@@ -0,0 +1,77 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+
+from app.clients.llm_executor import Attempt, run_with_deadline
+from app.clients.local_parser import parse_task_text_locally
+
+pool = ThreadPoolExecutor(max_workers=4)
+
+
+def _sleep_then(seconds, value):
+    def _call(timeout):
+        time.sleep(min(seconds, timeout))
+        if seconds > timeout:
+            raise TimeoutError("timeout")
+        return value
+    return _call
+
+
+def test_hedge_wins_when_primary_is_stuck():
+    attempts = [
+        Attempt("primary", 0.0, _sleep_then(5.0, "primary")),
+        Attempt("hedge", 0.05, _sleep_then(0.01, "hedge")),
+    ]
+    started = time.monotonic()
+    result = run_with_deadline(attempts, deadline=1.0, local_fallback=lambda: "local", pool=pool)
+
+    assert result == "hedge"
+    assert time.monotonic() - started < 0.5
+
+
+def test_failed_primary_launches_next_attempt_early():
+    def _fail(timeout):
+        raise RuntimeError("RESOURCE_EXHAUSTED")
+
+    attempts = [
+        Attempt("primary", 0.0, _fail),
+        Attempt("fallback", 0.8, _sleep_then(0.01, "fallback")),
+    ]
+    started = time.monotonic()
+    result = run_with_deadline(attempts, deadline=1.0, local_fallback=lambda: "local", pool=pool)
+
+    assert result == "fallback"
+    assert time.monotonic() - started < 0.5
+
+
+def test_local_fallback_after_deadline():
+    attempts = [Attempt("primary", 0.0, _sleep_then(5.0, "primary"))]
+    result = run_with_deadline(attempts, deadline=0.1, local_fallback=lambda: "local", pool=pool)
+
+    assert result == "local"
+
+
+def test_parse_task_text_locally():
+    parsed = parse_task_text_locally("明日の午前までに研究のスライド直す", today=date(2025, 12, 15))
+
+    assert parsed["title"] == "研究のスライド直す"
+    assert parsed["due_date"] == "2025-12-16"
+    assert parsed["priority"] == "high"
+    assert parsed["category"] == "Research"
+
+
+@pytest.mark.parametrize(
+    "text, title, due_date",
+    [
+        ("3日後に美容院予約", "美容院予約", "2025-12-18"),
+        ("来週の月曜にゼミ発表の準備", "ゼミ発表の準備", "2025-12-22"),
+        ("明日香と飲み会", "明日香と飲み会", None),
+    ],
+)
+def test_parse_task_text_locally_strips_only_the_date_expression(text, title, due_date):
+    parsed = parse_task_text_locally(text, today=date(2025, 12, 15))
+
+    assert parsed["title"] == title
+    assert parsed["due_date"] == due_date
@@ -0,0 +1,76 @@
+from app.clients import notion_client
+
+PAGE = {
+    "id": "page-1",
+    "url": "https://www.notion.so/page1",
+    "properties": {
+        "Title": {"id": "title", "title": [{"text": {"content": "スライド直す"}}]},
+        "Due": {"id": "d", "date": {"start": "2025-12-16"}},
+        "Priority": {"id": "p", "select": {"name": "high"}},
+        "Category": {"id": "c", "select": None},
+        "Status": {"id": "s", "status": {"name": "ToDo"}},
+    },
+}
+
+
+def test_extract_task_summary():
+    assert [notion_client.extract_task_summary(page) for page in (PAGE, {"id": "empty"})] == [
+        {
+            "title": "スライド直す",
+            "due": "2025-12-16",
+            "priority": "high",
+            "category": None,
+            "status": "ToDo",
+            "page_url": "https://www.notion.so/page1",
+            "page_id": "page-1",
+        },
+        {
+            "title": "",
+            "due": None,
+            "priority": None,
+            "category": None,
+            "status": None,
+            "page_url": None,
+            "page_id": "empty",
+        },
+    ]
+
+
+def test_projection_uses_property_ids(monkeypatch):
+    class _DataSources:
+        def retrieve(self, data_source_id):
+            return {"properties": {"Title": {"id": "title"}, "Due": {"id": "%3AdU"}, "Notes": {"id": "n"}}}
+
+    class _Notion:
+        data_sources = _DataSources()
+
+    monkeypatch.setattr(notion_client, "notion", _Notion())
+    monkeypatch.setattr(notion_client, "_property_ids", {})
+
+    assert notion_client._projection("ds-1") == {"filter_properties": ["title", "%3AdU"]}
+
+
+def test_query_open_tasks_pages_through_and_filters_by_user(monkeypatch):
+    calls = []
+
+    class _DataSources:
+        def query(self, data_source_id, **kwargs):
+            calls.append(kwargs)
+            start = int(kwargs.get("start_cursor") or 0)
+            has_more = start + kwargs["page_size"] < 150
+            return {"results": [{"id": str(i)} for i in range(start, min(start + kwargs["page_size"], 150))],
+                    "has_more": has_more, "next_cursor": str(start + kwargs["page_size"]) if has_more else None}
+
+    class _Notion:
+        data_sources = _DataSources()
+
+    monkeypatch.setattr(notion_client, "notion", _Notion())
+    monkeypatch.setattr(notion_client, "NOTION_USER_PROPERTY", "User")
+    monkeypatch.setattr(notion_client, "NOTION_PROPERTY_PROJECTION", False)
+    monkeypatch.setattr(notion_client, "_data_source_ids", {notion_client._tenants.default.database_id: "ds-1"})
+
+    pages = notion_client.query_open_tasks(user_id="U1")
+
+    assert len(pages) == 150
+    assert len(calls) == 2
+    assert {"property": "User", "rich_text": {"equals": "U1"}} in calls[0]["filter"]["and"]
@@ -0,0 +1,35 @@
+import threading
+import time
+
+from app.clients.notion_client import _SingleFlight
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    flight = _SingleFlight()
+    calls = []
+
+    def _query():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"results": [len(calls)]}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", _query))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+
+
+def test_cache_is_invalidated_on_write():
+    flight = _SingleFlight(ttl=60)
+    counter = iter(range(10))
+
+    first = flight.do("k", lambda: next(counter))
+    assert flight.do("k", lambda: next(counter)) == first
+
+    flight.invalidate()
+    assert flight.do("k", lambda: next(counter)) != first
@@ -0,0 +1,44 @@
+import json
+import time
+
+import pytest
+
+from app.clients.notion_tenants import DEFAULT_TENANT, load_tenants
+from app.clients.rate_limiter import TokenBucket
+
+
+def test_users_are_routed_to_their_tenant(tmp_path, monkeypatch):
+    monkeypatch.setenv("NOTION_API_KEY_LAB", "secret-lab")
+    path = tmp_path / "tenants.json"
+    path.write_text(json.dumps({
+        "tenants": [{"name": "lab", "api_key_env": "NOTION_API_KEY_LAB", "database_id": "db-lab", "users": ["U1"]}]
+    }))
+
+    router = load_tenants(str(path), "db-default", rate=3, burst=10)
+
+    lab = router.tenant_for("U1")
+    assert (lab.name, lab.database_id) == ("lab", "db-lab")
+    assert lab.client is not None
+    assert router.tenant_for("U2").name == DEFAULT_TENANT
+    assert router.tenant_for(None).database_id == "db-default"
+    assert lab.limiter is not router.default.limiter
+
+
+def test_missing_api_key_is_rejected(tmp_path):
+    path = tmp_path / "tenants.json"
+    path.write_text(json.dumps({"tenants": [{"name": "lab", "api_key_env": "NO_SUCH_ENV", "database_id": "db"}]}))
+
+    with pytest.raises(ValueError):
+        load_tenants(str(path), "db-default", rate=3, burst=10)
+
+
+def test_token_bucket_allows_burst_then_paces():
+    bucket = TokenBucket("test", rate=20, burst=2)
+
+    started = time.monotonic()
+    waits = [bucket.acquire() for _ in range(4)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert time.monotonic() - started >= 0.09  # 残り 2 回は 1/20 秒ずつ待つ
+    with pytest.raises(TimeoutError):
+        bucket.acquire(timeout=0.01)
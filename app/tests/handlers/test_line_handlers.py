@@ -0,0 +1,128 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from linebot.models import MessageEvent, SourceUser, TextMessage
+
+from app.clients import llm_client, notion_client
+from app.handlers import line_handlers
+from app.services import command_service, task_service
+from app.services.micro_batcher import MicroBatcher
+from app.services.title_index import title_index
+
+USER = "U-line-batch-test"
+
+
+def _event(text):
+    return SimpleNamespace(
+        reply_token=f"token-{text}",
+        source=SimpleNamespace(user_id=USER),
+        message=SimpleNamespace(text=text),
+    )
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    calls = []
+
+    def _parse_multiple_tasks(texts, **kwargs):
+        calls.append(("llm", list(texts)))
+        return [{"title": text, "due_date": None, "notes": None} for text in texts]
+
+    def _create_notion_task(title, **kwargs):
+        calls.append(("create", title))
+        if title == "壊れる":
+            raise ValueError("validation_error")
+        return f"page-{title}", f"https://www.notion.so/{title}"
+
+    def _update_task_status(page_id, status, user_id=None):
+        calls.append(("complete", page_id))
+
+    replies = []
+    monkeypatch.setattr(notion_client, "NOTION_USER_PROPERTY", "LINE User")
+    monkeypatch.setattr(llm_client, "parse_multiple_tasks", _parse_multiple_tasks)
+    monkeypatch.setattr(notion_client, "create_notion_task", _create_notion_task)
+    monkeypatch.setattr(notion_client, "update_task_status", _update_task_status)
+    monkeypatch.setattr(task_service, "load_title_index", lambda user_key: None)
+    monkeypatch.setattr(command_service, "load_title_index", lambda user_key: None)
+    monkeypatch.setattr(line_handlers, "line_bot_api", SimpleNamespace(
+        reply_message=lambda token, message: replies.append((token, message.text))
+    ))
+    title_index.load(USER, [{"page_id": "page-old", "title": "買い物", "due": None}])
+    return calls, replies
+
+
+def test_batch_is_extracted_once_and_answered_in_input_order(backends):
+    calls, replies = backends
+
+    line_handlers._handle_text_messages(USER, [_event("買い物 完了"), _event("買い物"), _event("壊れる")])
+
+    # タスク文の解析は 1 回、副作用は送られた順（完了 → 新規登録）
+    assert calls == [
+        ("llm", ["買い物", "壊れる"]),
+        ("complete", "page-old"),
+        ("create", "買い物"),
+        ("create", "壊れる"),
+    ]
+    # 返信は最初の reply token で 1 回だけ、1 件の失敗があっても全件の結果を入力順に返す
+    assert len(replies) == 1
+    token, text = replies[0]
+    assert token == "token-買い物 完了"
+    assert text.split("\n\n") == [
+        "完了にしました：買い物",
+        "タスク登録しました：買い物\nhttps://www.notion.so/買い物",
+        "処理できませんでした：壊れる",
+    ]
+
+
+def test_failed_extraction_still_replies_per_message(backends, monkeypatch):
+    calls, replies = backends
+
+    def _down(texts, **kwargs):
+        raise RuntimeError("gemini is down")
+
+    monkeypatch.setattr(llm_client, "parse_multiple_tasks", _down)
+
+    line_handlers._handle_text_messages(USER, [_event("スライド直す"), _event("メール送る")])
+
+    assert replies == [("token-スライド直す", "処理できませんでした：スライド直す\n\n処理できませんでした：メール送る")]
+
+
+def _webhook_event(user_id, text):
+    return MessageEvent(reply_token=f"token-{user_id}-{text}", source=SourceUser(user_id=user_id), message=TextMessage(text=text))
+
+
+def test_users_in_one_webhook_are_handled_concurrently_and_failures_stay_per_user(backends, monkeypatch):
+    calls, replies = backends
+    events = [
+        _webhook_event("U-ok", "スライド直す"),
+        _webhook_event("U-broken", "メール送る"),
+        _webhook_event("U-ok", "レポート出す"),
+        _webhook_event("U-broken", "買い物"),
+    ]
+
+    def _reply_message(token, message):
+        if token.startswith("token-U-broken"):
+            raise RuntimeError("LINE API is down")
+        replies.append((token, message.text))
+
+    monkeypatch.setattr(line_handlers, "parser", SimpleNamespace(parse=lambda body, signature: events))
+    monkeypatch.setattr(line_handlers, "line_bot_api", SimpleNamespace(reply_message=_reply_message))
+    monkeypatch.setattr(line_handlers, "line_batcher", MicroBatcher(
+        "test_line", window_sec=0.3, handle_batch=line_handlers._handle_text_messages
+    ))
+
+    started = time.monotonic()
+    asyncio.run(line_handlers.handle_line_webhook("{}", "signature"))
+    elapsed = time.monotonic() - started
+
+    # U-broken の返信が失敗しても、U-ok のメッセージは登録・返信される（例外も Webhook の外に出ない）
+    assert replies == [(
+        "token-U-ok-スライド直す",
+        "タスク登録しました：スライド直す\nhttps://www.notion.so/スライド直す\n\n"
+        "タスク登録しました：レポート出す\nhttps://www.notion.so/レポート出す",
+    )]
+    assert ("create", "買い物") in calls
+    # 2 人分の window を順に待たず、並行に処理する
+    assert elapsed < 0.55
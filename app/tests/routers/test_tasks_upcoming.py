@@ -0,0 +1,99 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.clients import notion_client
+from app.main import app
+
+
+def _page(i: int):
+    return {
+        "id": f"page-{i}",
+        "url": f"https://www.notion.so/page{i}",
+        "properties": {
+            "Title": {"title": [{"text": {"content": f"タスク{i}"}}]},
+            "Due": {"date": {"start": f"2025-12-{10 + i:02d}"}},
+            "Status": {"status": {"name": "ToDo"}},
+        },
+    }
+
+
+class PagedNotion:
+    def __init__(self, n_pages: int):
+        self.pages = [_page(i) for i in range(n_pages)]
+        self.queries = []
+        self.databases = SimpleNamespace(retrieve=lambda database_id: {"data_sources": [{"id": "ds"}]})
+        self.data_sources = SimpleNamespace(query=self._query, retrieve=lambda data_source_id: {"properties": {}})
+
+    def _query(self, data_source_id, **kwargs):
+        self.queries.append(kwargs)
+        start = int(kwargs.get("start_cursor") or 0)
+        end = start + kwargs["page_size"]
+        has_more = end < len(self.pages)
+        return {"results": self.pages[start:end], "has_more": has_more, "next_cursor": str(end) if has_more else None}
+
+
+@pytest.fixture
+def fake_notion(monkeypatch):
+    fake = PagedNotion(5)
+    monkeypatch.setattr(notion_client, "notion", fake)
+    monkeypatch.setattr(notion_client, "_data_source_ids", {})
+    monkeypatch.setattr(notion_client, "_property_ids", {})
+    monkeypatch.setattr(notion_client, "_property_options", {})
+    notion_client.invalidate_query_cache()
+    return fake
+
+
+def test_pages_with_cursor_and_selects_fields(fake_notion):
+    client = TestClient(app)
+
+    first = client.get("/tasks/upcoming", params={"limit": 2, "fields": "title,due", "category": "Job"})
+    second = client.get("/tasks/upcoming", params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+
+    assert first.json() == [{"title": "タスク0", "due": "2025-12-10"}, {"title": "タスク1", "due": "2025-12-11"}]
+    assert [t["page_id"] for t in second.json()] == ["page-2", "page-3"]
+    assert {"property": "Category", "select": {"equals": "Job"}} in fake_notion.queries[0]["filter"]["and"]
+
+
+def test_if_none_match_returns_304(fake_notion):
+    client = TestClient(app)
+
+    etag = client.get("/tasks/upcoming").headers["ETag"]
+    resp = client.get("/tasks/upcoming", headers={"If-None-Match": etag})
+
+    assert resp.status_code == 304
+    assert resp.content == b""
+
+
+def test_ndjson_streams_all_pages(fake_notion):
+    client = TestClient(app)
+
+    resp = client.get("/tasks/upcoming", params={"format": "ndjson", "limit": 2, "fields": "page_id"})
+
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in resp.text.splitlines()] == [{"page_id": f"page-{i}"} for i in range(5)]
+
+
+def test_user_filter_requires_user_property(fake_notion, monkeypatch):
+    monkeypatch.setattr(notion_client, "NOTION_USER_PROPERTY", None)
+
+    resp = TestClient(app).get("/tasks/upcoming", params={"user": "U1"})
+
+    assert resp.status_code == 400
+
+
+def test_unknown_status_or_category_returns_400(fake_notion):
+    fake_notion.data_sources.retrieve = lambda data_source_id: {"properties": {
+        "Status": {"id": "s", "type": "status", "status": {"options": [{"name": "ToDo"}, {"name": "Done"}]}},
+        "Category": {"id": "c", "type": "select", "select": {"options": [{"name": "Job"}, {"name": "Research"}]}},
+    }}
+    client = TestClient(app)
+
+    assert client.get("/tasks/upcoming", params={"status": "Doing"}).status_code == 400
+    assert client.get("/tasks/upcoming", params={"category": "job", "format": "ndjson"}).status_code == 400
+    # 不正な条件は Notion に投げない
+    assert fake_notion.queries == []
+
+    assert client.get("/tasks/upcoming", params={"status": "ToDo", "category": "Job"}).status_code == 200
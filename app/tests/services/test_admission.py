@@ -0,0 +1,122 @@
+import asyncio
+import threading
+
+import anyio.to_thread
+import pytest
+
+from app.services import admission, metrics
+from app.services.admission import AdmissionController, AdmissionRejected
+
+
+async def _hold(controller, user_id, started, release, order=None):
+    async with controller.admit(user_id):
+        if order is not None:
+            order.append(user_id)
+        started.set()
+        await asyncio.wait_for(release.wait(), 2)
+
+
+def test_rejects_when_queue_is_full():
+    async def _run():
+        controller = AdmissionController("test_full", max_in_flight=1, max_queue=0, max_queue_per_user=1, max_wait_sec=1)
+        started, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, "a", started, release))
+        await started.wait()
+
+        with pytest.raises(AdmissionRejected) as e:
+            async with controller.admit("b"):
+                pass
+        assert e.value.status_code == 503
+
+        release.set()
+        await holder
+
+    asyncio.run(_run())
+    assert metrics.get_value("admission_queue_wait_seconds", endpoint="test_full") == 2
+
+
+def test_round_robin_between_users():
+    async def _run():
+        controller = AdmissionController("test_fair", max_in_flight=1, max_queue=10, max_queue_per_user=5, max_wait_sec=2)
+        order = []
+        release = asyncio.Event()
+        release.set()
+
+        blocker_started, blocker_release = asyncio.Event(), asyncio.Event()
+        blocker = asyncio.create_task(_hold(controller, "x", blocker_started, blocker_release))
+        await blocker_started.wait()
+
+        # heavy が 3 件積んだあとに light が 1 件来ても、light は 2 番目に通る
+        tasks = []
+        for user_id in ["heavy", "heavy", "heavy", "light"]:
+            tasks.append(asyncio.create_task(_hold(controller, user_id, asyncio.Event(), release, order)))
+            await asyncio.sleep(0)
+
+        blocker_release.set()
+        await asyncio.gather(blocker, *tasks)
+        return order
+
+    assert asyncio.run(_run()) == ["heavy", "light", "heavy", "heavy"]
+
+
+def test_per_user_limit_returns_429():
+    async def _run():
+        controller = AdmissionController("test_user", max_in_flight=1, max_queue=10, max_queue_per_user=1, max_wait_sec=1)
+        started, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, "a", started, release))
+        await started.wait()
+        waiter = asyncio.create_task(_hold(controller, "a", asyncio.Event(), release))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as e:
+            async with controller.admit("a"):
+                pass
+        assert e.value.status_code == 429
+
+        release.set()
+        await asyncio.gather(holder, waiter)
+
+    asyncio.run(_run())
+
+
+def test_queued_requests_do_not_hold_threads():
+    async def _run():
+        controller = AdmissionController("test_threads", max_in_flight=1, max_queue=50, max_queue_per_user=50, max_wait_sec=2)
+        started, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, "a", started, release))
+        await started.wait()
+
+        threads_before = threading.active_count()
+        waiters = [asyncio.create_task(_hold(controller, "a", asyncio.Event(), release)) for _ in range(50)]
+        await asyncio.sleep(0.05)
+        # 50 件が待ち行列にいても、スレッドは 1 本も増えない
+        assert threading.active_count() == threads_before
+        assert metrics.get_value("admission_queue_length", endpoint="test_threads") == 50
+
+        release.set()
+        await asyncio.gather(holder, *waiters)
+
+    asyncio.run(_run())
+
+
+def test_thread_capacity_check():
+    controllers = [
+        AdmissionController("a", max_in_flight=20, max_queue=100, max_queue_per_user=4, max_wait_sec=1),
+        AdmissionController("b", max_in_flight=16, max_queue=100, max_queue_per_user=4, max_wait_sec=1),
+    ]
+
+    admission.check_thread_capacity(40, reserved=4, controllers=controllers)
+    with pytest.raises(ValueError):
+        admission.check_thread_capacity(40, reserved=8, controllers=controllers)
+
+
+def test_default_endpoints_fit_in_the_default_threadpool():
+    # エンドポイントの AdmissionController を登録させる
+    import app.handlers.line_handlers  # noqa: F401
+    import app.routers.tasks  # noqa: F401
+
+    async def _total_tokens():
+        return anyio.to_thread.current_default_thread_limiter().total_tokens
+
+    assert {c.name for c in admission._controllers} >= {"parse_and_create", "line_webhook"}
+    admission.check_thread_capacity(asyncio.run(_total_tokens()))
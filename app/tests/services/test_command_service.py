@@ -0,0 +1,69 @@
+from datetime import date
+
+import pytest
+
+from app.clients import notion_client
+from app.services import command_service
+from app.services.command_service import Command, execute_command
+from app.services.title_index import title_index
+
+USER = "U-command-test"
+
+
+@pytest.fixture
+def completed(monkeypatch):
+    completed = []
+    monkeypatch.setattr(notion_client, "NOTION_USER_PROPERTY", "LINE User")
+    monkeypatch.setattr(notion_client, "update_task_status", lambda page_id, status, user_id=None: completed.append(page_id))
+    monkeypatch.setattr(command_service, "load_title_index", lambda user_key: None)
+    title_index.load(USER, [
+        {"page_id": "p1", "title": "掃除機を買う", "due": None},
+        {"page_id": "p2", "title": "研究のスライド直す", "due": None},
+        {"page_id": "p3", "title": "ゼミ発表の準備", "due": None},
+        {"page_id": "p4", "title": "ゼミ発表の練習", "due": None},
+    ])
+    return completed
+
+
+def test_clear_match_is_completed(completed):
+    result = execute_command(Command(action="complete", title_query="スライド直す"), user_id=USER)
+
+    assert result.ok
+    assert completed == ["p2"]
+
+
+def test_weak_match_is_not_completed(completed):
+    result = execute_command(Command(action="complete", title_query="掃除"), user_id=USER)
+
+    assert not result.ok
+    assert completed == []
+
+
+def test_close_candidates_ask_for_confirmation(completed):
+    result = execute_command(Command(action="complete", title_query="ゼミ発表"), user_id=USER)
+
+    assert not result.ok
+    assert completed == []
+    assert "・ゼミ発表の準備 完了" in result.message
+    assert "・ゼミ発表の練習 完了" in result.message
+
+    # 候補の文面どおりに送り直せば実行される
+    result = execute_command(command_service.parse_command("ゼミ発表の練習 完了"), user_id=USER)
+    assert result.ok
+    assert completed == ["p4"]
+
+
+def test_reschedule_confirmation_keeps_the_date(completed):
+    result = execute_command(Command(action="reschedule", title_query="ゼミ発表", due_date=date(2025, 12, 24)), user_id=USER)
+
+    assert "・ゼミ発表の準備 12/24に変更" in result.message
+    assert command_service.parse_command("ゼミ発表の準備 12/24に変更", today=date(2025, 12, 15)).due_date == date(2025, 12, 24)
+
+
+def test_commands_are_refused_without_a_user_column(completed, monkeypatch):
+    monkeypatch.setattr(notion_client, "NOTION_USER_PROPERTY", None)
+
+    result = execute_command(Command(action="complete", title_query="研究のスライド直す"), user_id=USER)
+
+    assert result.message == command_service.NO_USER_SCOPE_MESSAGE
+    assert completed == []
@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+from app.services.micro_batcher import MicroBatcher
+
+
+def _run_in_threads(batcher, calls):
+    errors = []
+
+    def _call(key, items):
+        try:
+            batcher.process(key, items)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=_call, args=call) for call in calls]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+    assert not any(t.is_alive() for t in threads)
+    return errors
+
+
+def test_concurrent_calls_for_a_user_are_handled_as_one_batch():
+    batches = []
+    batcher = MicroBatcher("test", window_sec=60, handle_batch=lambda key, items: batches.append((key, sorted(items))), max_batch=2)
+
+    # window は長いが、2 件たまった時点で処理されて両方の呼び出しが戻る
+    _run_in_threads(batcher, [("U1", ["a"]), ("U1", ["b"])])
+
+    assert batches == [("U1", ["a", "b"])]
+
+
+def test_single_call_is_handled_in_the_calling_thread_after_the_window():
+    handled_in = []
+    batcher = MicroBatcher("test", window_sec=0.01, handle_batch=lambda key, items: handled_in.append(threading.get_ident()))
+
+    batcher.process("U1", ["a"])
+
+    # 呼び出したスレッドで処理されるので、戻った時点で処理は終わっている（トレースのコンテキストも引き継がれる）
+    assert handled_in == [threading.get_ident()]
+
+
+def test_handler_error_is_raised_in_every_caller():
+    def _fail(key, items):
+        raise RuntimeError("boom")
+
+    batcher = MicroBatcher("test", window_sec=60, handle_batch=_fail, max_batch=2)
+
+    errors = _run_in_threads(batcher, [("U1", ["a"]), ("U1", ["b"])])
+
+    assert [str(e) for e in errors] == ["boom", "boom"]
+
+    with pytest.raises(RuntimeError):
+        MicroBatcher("test", window_sec=0, handle_batch=_fail).process("U1", ["a"])
@@ -0,0 +1,98 @@
+import pytest
+
+from app.clients import notion_client
+from app.clients.circuit_breaker import CircuitOpenError
+from app.clients.rate_limiter import RateLimitExceeded
+from app.models.task import Task
+from app.services import task_service
+from app.services.admission import AdmissionRejected
+from app.services.pending_tasks import PendingTaskQueue
+
+
+def test_flush_keeps_tasks_while_outage_and_writes_after_recovery():
+    written = []
+    down = True
+
+    def _write(task: Task) -> None:
+        if down:
+            raise CircuitOpenError("notion: circuit is open")
+        written.append(task.title)
+
+    queue = PendingTaskQueue(_write, is_outage=lambda e: isinstance(e, CircuitOpenError), flush_interval=3600)
+    queue.enqueue(Task(title="スライド直す"))
+    queue.enqueue(Task(title="メール送る"))
+
+    assert queue.flush() == 0
+    assert len(queue) == 2
+
+    down = False
+    assert queue.flush() == 2
+    assert written == ["スライド直す", "メール送る"]
+    assert len(queue) == 0
+
+
+
+def test_saturated_rate_limit_is_queued_and_full_queue_asks_to_resend(monkeypatch):
+    def _create_notion_task(**kwargs):
+        raise RateLimitExceeded("notion:default: rate limit wait 40.00s exceeds 30s")
+
+    monkeypatch.setattr(notion_client, "create_notion_task", _create_notion_task)
+    monkeypatch.setattr(task_service, "pending_tasks", PendingTaskQueue(
+        task_service._save_to_notion, notion_client.is_outage_error, flush_interval=3600, max_size=1
+    ))
+    parsed = {"title": "スライド直す", "due_date": None}
+
+    task = task_service._create_task("スライド直す", parsed, None, "web", "U1", allow_duplicate=True)
+    assert task.is_pending
+
+    with pytest.raises(AdmissionRejected) as e:
+        task_service._create_task("メール送る", parsed, None, "web", "U1", allow_duplicate=True)
+    assert e.value.status_code == 503
+
+
+def test_later_requests_flush_a_few_pending_tasks_once_the_interval_has_passed():
+    written = []
+    queue = PendingTaskQueue(lambda task: written.append(task.title), is_outage=lambda e: False, flush_interval=60)
+    for title in ["a", "b", "c"]:
+        queue.enqueue(Task(title=title))
+
+    # 保留し始めてから flush_interval 秒たつまでは書き込まない
+    assert queue.flush_if_due(max_tasks=2) == 0
+
+    queue._last_flush -= 61
+    assert queue.flush_if_due(max_tasks=2) == 2
+    assert written == ["a", "b"]
+    # 直後のリクエストでは試さない
+    assert queue.flush_if_due(max_tasks=2) == 0
+
+
+def test_create_task_writes_pending_tasks_first(monkeypatch):
+    created = []
+
+    def _create_notion_task(title, **kwargs):
+        created.append(title)
+        return f"page-{title}", f"https://www.notion.so/{title}"
+
+    monkeypatch.setattr(notion_client, "create_notion_task", _create_notion_task)
+    queue = PendingTaskQueue(task_service._save_to_notion, notion_client.is_outage_error, flush_interval=60)
+    queue.enqueue(Task(title="障害中に送ったタスク", user_id="U1"))
+    queue._last_flush -= 61
+    monkeypatch.setattr(task_service, "pending_tasks", queue)
+
+    task_service._create_task("メール送る", {"title": "メール送る", "due_date": None}, None, "web", "U1", allow_duplicate=True)
+
+    assert created == ["障害中に送ったタスク", "メール送る"]
+    assert len(queue) == 0
+
+
+def test_flush_before_exit_logs_tasks_it_could_not_write(capsys):
+    def _down(task):
+        raise CircuitOpenError("notion: circuit is open")
+
+    queue = PendingTaskQueue(_down, is_outage=lambda e: isinstance(e, CircuitOpenError), flush_interval=3600)
+    queue.enqueue(Task(title="スライド直す", user_id="U1"))
+
+    queue.flush_before_exit(timeout=1)
+
+    assert len(queue) == 0
+    assert "Lost pending task 'スライド直す' from U1" in capsys.readouterr().out
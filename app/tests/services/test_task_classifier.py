@@ -0,0 +1,44 @@
+from datetime import date, timedelta
+
+from app.services.task_classifier import TaskClassifier, classify_task
+
+TASKS = [
+    {"title": "ゼミ発表のスライド作成", "category": "Research", "priority": "high"},
+    {"title": "論文のスライド修正", "category": "Research", "priority": "high"},
+    {"title": "研究室の実験データ整理", "category": "Research", "priority": "medium"},
+    {"title": "面接の準備", "category": "Job", "priority": "high"},
+    {"title": "ES を書く", "category": "Job", "priority": "medium"},
+    {"title": "説明会にエントリー", "category": "Job", "priority": "low"},
+    {"title": "スーパーで買い物", "category": "Private", "priority": "low"},
+    {"title": "部屋の掃除", "category": "Private", "priority": "low"},
+    {"title": "買い物リスト作成", "category": "Private", "priority": "low"},
+    {"title": "統計のレポート課題", "category": "Classes", "priority": "medium"},
+    {"title": "英語の課題提出", "category": "Classes", "priority": "medium"},
+]
+
+
+def test_fit_predict_and_roundtrip(tmp_path):
+    model = TaskClassifier.fit(TASKS)
+
+    category, _ = model.predict("研究のスライド直す", min_confidence=0.0)
+    assert category == "Research"
+    category, priority = model.predict("日曜に買い物", min_confidence=0.0)
+    assert category == "Private"
+    assert priority == "low"
+
+    path = tmp_path / "model.json.gz"
+    model.save(str(path))
+    loaded = TaskClassifier.load(str(path))
+
+    assert loaded.predict("課題のレポート", min_confidence=0.0) == model.predict("課題のレポート", min_confidence=0.0)
+
+
+def test_classify_task_falls_back_to_due_distance_for_priority():
+    model = TaskClassifier.fit(TASKS)
+    today = date.today()
+
+    # 学習データにない語だけのタイトルは確信度が低いので、優先度は期限までの日数で決まる
+    _, priority = classify_task("xyz", model, due_date=today + timedelta(days=1))
+    assert priority == "high"
+    _, priority = classify_task("xyz", model, due_date=today + timedelta(days=30))
+    assert priority == "low"
@@ -0,0 +1,111 @@
+from datetime import date
+
+import pytest
+
+from app.clients import notion_client
+from app.services import task_service
+from app.services.command_service import parse_command
+from app.services.title_index import TitleIndex, title_index
+
+
+def _task(page_id, title, due=None):
+    return {"page_id": page_id, "title": title, "due": due, "priority": "medium", "status": "ToDo", "page_url": None}
+
+
+def test_search_finds_closest_title_and_tracks_updates():
+    index = TitleIndex()
+    index.load("u1", [_task("p1", "研究のスライド直す"), _task("p2", "買い物に行く"), _task("p3", "ESを書く")])
+
+    assert index.best_match("u1", "スライド直す")["page_id"] == "p1"
+    assert index.best_match("u1", "買い物")["page_id"] == "p2"
+    assert index.best_match("u2", "買い物") is None
+
+    index.remove("u1", "p1")
+    assert index.best_match("u1", "スライド直す") is None
+
+    index.add("u1", _task("p4", "スライド 直す（第2版）"))
+    assert index.best_match("u1", "スライド直す")["page_id"] == "p4"
+
+
+def test_parse_command():
+    today = date(2025, 12, 15)
+
+    complete = parse_command("スライド直す 完了", today=today)
+    assert complete.action == "complete"
+    assert complete.title_query == "スライド直す"
+
+    reschedule = parse_command("買い物 明日に変更", today=today)
+    assert reschedule.action == "reschedule"
+    assert reschedule.title_query == "買い物"
+    assert reschedule.due_date == date(2025, 12, 16)
+
+    assert parse_command("明日の午前までに研究のスライド直す", today=today) is None
+
+
+def test_find_duplicate_requires_similar_title_and_same_due():
+    index = TitleIndex()
+    index.load("u1", [_task("p1", "研究のスライドを直す", due="2025-12-16")])
+
+    assert index.find_duplicate("u1", "研究のスライド直す", "2025-12-16")["page_id"] == "p1"
+    assert index.find_duplicate("u1", "研究のスライド直す", "2025-12-17") is None
+    assert index.find_duplicate("u1", "就活のメールを送る", "2025-12-16") is None
+
+
+def test_load_replaces_index_and_expires_after_max_age():
+    index = TitleIndex()
+    index.load("u1", [_task("p1", "研究のスライド直す")])
+    assert index.is_loaded("u1", max_age=60)
+    assert not index.is_loaded("u1", max_age=0)
+
+    # Notion 上で完了・改名されたタスクは読み込み直すと消える
+    index.load("u1", [_task("p2", "買い物に行く")])
+    assert index.best_match("u1", "スライド直す") is None
+    assert index.best_match("u1", "買い物")["page_id"] == "p2"
+
+
+@pytest.fixture
+def notion_writes(monkeypatch):
+    created, queried = [], []
+
+    def _query_open_tasks(max_tasks, user_id=None):
+        queried.append(user_id)
+        return [{"id": "page-a", "url": "https://www.notion.so/page-a", "properties": {
+            "Title": {"title": [{"text": {"content": "研究のスライド直す"}}]},
+            "Status": {"status": {"name": "ToDo"}},
+        }}]
+
+    def _create_notion_task(title, **kwargs):
+        created.append(title)
+        return f"page-{len(created)}", f"https://www.notion.so/page-{len(created)}"
+
+    monkeypatch.setattr(notion_client, "query_open_tasks", _query_open_tasks)
+    monkeypatch.setattr(notion_client, "create_notion_task", _create_notion_task)
+    return created, queried
+
+
+def test_shared_database_without_user_column_skips_duplicate_check(notion_writes, monkeypatch):
+    created, queried = notion_writes
+    monkeypatch.setattr(notion_client, "NOTION_USER_PROPERTY", None)
+    parsed = {"title": "研究のスライド直す", "due_date": None}
+
+    # 別のユーザーが同じタイトルのタスクを持っていても、自分のタスクとして登録される
+    task = task_service._create_task("研究のスライド直す", parsed, None, "line", "U-dedup-b", allow_duplicate=False)
+
+    assert not task.is_duplicate
+    assert created == ["研究のスライド直す"]
+    # ユーザーごとに DB 全体を読み込まない
+    assert queried == []
+    assert not title_index.is_loaded(task_service.SHARED_TITLE_INDEX_KEY)
+
+
+def test_duplicate_check_with_user_column_reads_only_the_users_tasks(notion_writes, monkeypatch):
+    created, queried = notion_writes
+    monkeypatch.setattr(notion_client, "NOTION_USER_PROPERTY", "LINE User")
+    parsed = {"title": "研究のスライド直す", "due_date": None}
+
+    task = task_service._create_task("研究のスライド直す", parsed, None, "line", "U-dedup-a", allow_duplicate=False)
+
+    assert task.is_duplicate
+    assert task.page_id == "page-a"
+    assert created == []
+    assert queried == ["U-dedup-a"]
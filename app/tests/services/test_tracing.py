@@ -0,0 +1,31 @@
+import contextvars
+
+from app.services import tracing
+
+
+@tracing.traced("outer")
+def _outer():
+    return _inner() + 1
+
+
+@tracing.traced("inner")
+def _inner():
+    return 1
+
+
+def test_traced_is_passthrough_without_trace():
+    assert _outer() == 2
+
+
+def test_spans_are_nested_and_collapsed():
+    def _run():
+        trace = tracing.start_trace("test")
+        _outer()
+        return trace
+
+    trace = contextvars.copy_context().run(_run)
+    spans = {s["name"]: s for s in trace.to_dict()["spans"]}
+
+    assert spans["inner"]["parent_id"] == spans["outer"]["id"]
+    assert spans["outer"]["parent_id"] is None
+    assert "outer;inner " in trace.to_collapsed()
@@ -0,0 +1,170 @@
+"""
+負荷試験用に、外部サービス（Gemini / Notion / LINE）を偽物に差し替えた FastAPI アプリ。
+
+    uvicorn benchmarks.fake_app:app --workers 2 --port 8765
+
+各バックエンドのレイテンシは環境変数で変えられる。
+    FAKE_LLM_LATENCY_MS (デフォルト 800)
+    FAKE_NOTION_LATENCY_MS (デフォルト 300)
+    FAKE_LINE_LATENCY_MS (デフォルト 50)
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+# app の各モジュールは import 時に環境変数を必須チェックするので、先にダミー値を入れておく
+for _name in (
+    "LLM_API_KEY",
+    "NOTION_API_KEY",
+    "NOTION_DATABASE_ID",
+    "LINE_CHANNEL_SECRET",
+    "LINE_CHANNEL_ACCESS_TOKEN",
+    "LINE_USER_ID",
+    "CRON_SECRET_TOKEN",
+):
+    os.environ.setdefault(_name, f"fake-{_name.lower()}")
+
+# アプリ自体の限界を測るため、Notion のレート制限（実環境は 3 回/秒）は実質なしにしておく
+os.environ.setdefault("NOTION_RATE_LIMIT_RPS", "100000")
+os.environ.setdefault("NOTION_RATE_LIMIT_BURST", "100000")
+
+from app.clients import llm_client, notion_client  # noqa: E402
+from app.clients.local_parser import parse_task_text_locally  # noqa: E402
+from app.handlers import line_handlers  # noqa: E402
+from app.main import app  # noqa: E402
+
+# Webhook への応答ヘッダーで、そのリクエスト中に「混雑中」と返信した回数を負荷ツールに伝える
+# （LINE の受付制限は HTTP 200 + 混雑メッセージの返信なので、ステータスだけでは区別できない）
+BUSY_REPLIES_HEADER = "X-Fake-Line-Busy-Replies"
+
+
+def _sleep_ms(env_name: str, default: int) -> None:
+    time.sleep(int(os.getenv(env_name, default)) / 1000)
+
+
+# ----------------------------
+# Gemini
+# ----------------------------
+class FakeGenerativeModel:
+    def __init__(self, model_name: str, *args: Any, **kwargs: Any):
+        self.model_name = model_name
+
+    def generate_content(self, prompt: str, *args: Any, **kwargs: Any) -> SimpleNamespace:
+        _sleep_ms("FAKE_LLM_LATENCY_MS", 800)
+        if "# 入力（" in prompt:
+            # build_batch_prompt: 「# 入力（n 件）」以降の番号付きの行がそれぞれのタスク
+            lines = prompt.split("# 入力（", 1)[1].strip().splitlines()[1:]
+            parsed: Any = [parse_task_text_locally(line.split(". ", 1)[-1]) for line in lines]
+        else:
+            # build_prompt の末尾にある「# 入力文」以降をユーザー入力として扱う
+            text = prompt.split("# 入力文", 1)[-1].split("JSON のみを返してください。", 1)[0].strip()
+            parsed = parse_task_text_locally(text)
+        text = json.dumps(parsed, ensure_ascii=False)
+        # トークン数はプロンプト・回答の文字数から概算する（回答の形式が長くなれば出力側も増える）
+        return SimpleNamespace(
+            text=text,
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=len(prompt) // 2,
+                candidates_token_count=len(text) // 2,
+                total_token_count=len(prompt) // 2 + len(text) // 2,
+            ),
+        )
+
+
+# ----------------------------
+# Notion
+# ----------------------------
+class FakeNotion:
+    """
+    notion_client.Client のうち、アプリが使うメソッドだけを持つ偽物。
+    作成したページはメモリに保持し、query で返す。
+    """
+
+    def __init__(self) -> None:
+        self._pages: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.pages = SimpleNamespace(create=self._create_page, update=self._update_page)
+        self.databases = SimpleNamespace(retrieve=self._retrieve_database)
+        self.data_sources = SimpleNamespace(query=self._query, retrieve=self._retrieve_data_source)
+
+    def _create_page(self, parent: Dict[str, Any], properties: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        _sleep_ms("FAKE_NOTION_LATENCY_MS", 300)
+        page_id = str(uuid.uuid4())
+        page = {
+            "id": page_id,
+            "url": f"https://www.notion.so/{page_id.replace('-', '')}",
+            "properties": properties,
+        }
+        with self._lock:
+            self._pages[page_id] = page
+        return page
+
+    def _update_page(self, page_id: str, properties: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        _sleep_ms("FAKE_NOTION_LATENCY_MS", 300)
+        with self._lock:
+            page = self._pages.setdefault(
+                page_id, {"id": page_id, "url": f"https://www.notion.so/{page_id}", "properties": {}}
+            )
+            page["properties"].update(properties)
+        return page
+
+    def _retrieve_database(self, database_id: str, **kwargs: Any) -> Dict[str, Any]:
+        return {"id": database_id, "data_sources": [{"id": f"ds-{database_id}"}]}
+
+    def _retrieve_data_source(self, data_source_id: str, **kwargs: Any) -> Dict[str, Any]:
+        names = ("Title", "Status", "Priority", "Source", "Due", "Notes", "Category")
+        return {"id": data_source_id, "properties": {name: {"id": f"p{i}", "name": name} for i, name in enumerate(names)}}
+
+    def _query(self, data_source_id: str, **kwargs: Any) -> Dict[str, Any]:
+        _sleep_ms("FAKE_NOTION_LATENCY_MS", 300)
+        # フィルタは無視し、作成順に page_size 件ずつ返す（カーソルは次の位置）
+        page_size = kwargs.get("page_size", 100)
+        start = int(kwargs.get("start_cursor") or 0)
+        with self._lock:
+            pages = list(self._pages.values())
+        results: List[Dict[str, Any]] = pages[start:start + page_size]
+        has_more = start + page_size < len(pages)
+        return {"results": results, "has_more": has_more, "next_cursor": str(start + page_size) if has_more else None}
+
+
+# ----------------------------
+# LINE
+# ----------------------------
+# リクエストごとの返信の記録。スレッドプールにもコンテキストごと引き継がれる
+_replies: ContextVar[Optional[List[str]]] = ContextVar("fake_line_replies", default=None)
+
+
+class FakeLineBotApi:
+    def reply_message(self, reply_token: str, messages: Any, *args: Any, **kwargs: Any) -> None:
+        _sleep_ms("FAKE_LINE_LATENCY_MS", 50)
+        replies = _replies.get()
+        if replies is not None:
+            replies.append(getattr(messages, "text", None) or "")
+
+    def push_message(self, to: str, messages: Any, *args: Any, **kwargs: Any) -> None:
+        _sleep_ms("FAKE_LINE_LATENCY_MS", 50)
+
+
+llm_client.genai.GenerativeModel = FakeGenerativeModel
+notion_client.notion = FakeNotion()
+line_handlers.line_bot_api = FakeLineBotApi()
+
+
+@app.middleware("http")
+async def count_busy_replies(request: Any, call_next: Any) -> Any:
+    if request.url.path != "/webhook/line":
+        return await call_next(request)
+
+    replies: List[str] = []
+    _replies.set(replies)
+    response = await call_next(request)
+    response.headers[BUSY_REPLIES_HEADER] = str(sum(1 for text in replies if text == line_handlers.BUSY_MESSAGE))
+    return response
+
+
+__all__ = ["app"]
@@ -0,0 +1,444 @@
+"""
+LINE Webhook (/webhook/line) 向けの負荷生成ツール。
+
+署名付きの Webhook ペイロードを合成（またはファイルから再生）し、指定したレートと
+バースト形状で送りつけて、飽和スループット・同時実行数の「膝」・ワーカーごとのメモリ増加を報告する。
+
+    # 偽バックエンドのアプリを 2 ワーカーで起動し、5 rps 刻みで 60 rps まで上げる
+    python -m benchmarks.line_webhook_load --spawn-app --workers 2 \\
+        --shape step --rate 5 --max-rate 60 --step-sec 10
+
+    # 既存のサーバーに対し、キャプチャした Webhook を 20 rps で再生する
+    python -m benchmarks.line_webhook_load --url http://localhost:8000 \\
+        --replay captured_webhooks.jsonl --shape constant --rate 20 --duration 60
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+# fake_app が「混雑中」と返信した回数を入れる応答ヘッダー（fake_app.BUSY_REPLIES_HEADER と同じ）
+BUSY_REPLIES_HEADER = "X-Fake-Line-Busy-Replies"
+
+SAMPLE_TEXTS = [
+    "明日の午前までに研究のスライド直す",
+    "金曜までに就活のメール送る",
+    "今日やること：買い物",
+    "来週の月曜にゼミ発表の準備",
+    "12/20 までにレポート提出",
+    "3日後に美容院予約",
+    "ES を明後日までに書く",
+    "論文の関連研究を読む",
+]
+
+
+# ----------------------------
+# ペイロード生成・署名
+# ----------------------------
+def compute_signature(body: str, channel_secret: str) -> str:
+    """
+    WebhookParser と同じ方式で X-Line-Signature を計算する。
+    （channel secret を鍵にした本文の HMAC-SHA256 を Base64 エンコード）
+    """
+    digest = hmac.new(channel_secret.encode("utf-8"), body.encode("utf-8"), hashlib.sha256).digest()
+    return base64.b64encode(digest).decode("utf-8")
+
+
+def build_text_event(user_id: str, text: str) -> Dict[str, Any]:
+    """
+    LINE のテキストメッセージイベントを 1 件組み立てる。
+    """
+    return {
+        "type": "message",
+        "mode": "active",
+        "timestamp": int(time.time() * 1000),
+        "source": {"type": "user", "userId": user_id},
+        "webhookEventId": uuid.uuid4().hex.upper()[:26],
+        "deliveryContext": {"isRedelivery": False},
+        "replyToken": uuid.uuid4().hex,
+        "message": {
+            "id": str(random.randint(10**17, 10**18 - 1)),
+            "type": "text",
+            "quoteToken": uuid.uuid4().hex,
+            "text": text,
+        },
+    }
+
+
+def synthesize_body(n_users: int, rng: random.Random) -> str:
+    user_id = "U" + hashlib.md5(str(rng.randrange(n_users)).encode()).hexdigest()
+    body = {
+        "destination": "Ufakedestination",
+        "events": [build_text_event(user_id, rng.choice(SAMPLE_TEXTS))],
+    }
+    return json.dumps(body, ensure_ascii=False, separators=(",", ":"))
+
+
+def load_replay_bodies(path: str) -> List[str]:
+    """
+    1 行 1 Webhook 本文 (JSON) のファイルを読み込む。署名は送信時に付け直す。
+    """
+    bodies = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                bodies.append(json.dumps(json.loads(line), ensure_ascii=False, separators=(",", ":")))
+    if not bodies:
+        raise ValueError(f"No webhook bodies found in {path}")
+    return bodies
+
+
+# ----------------------------
+# 送信スケジュール（レート・バースト形状）
+# ----------------------------
+def build_schedule(args: argparse.Namespace) -> List[Tuple[float, str]]:
+    """
+    (送信時刻[秒], ステップ名) のリストを作る。
+    """
+    schedule: List[Tuple[float, str]] = []
+
+    def _constant(start: float, duration: float, rate: float, label: str) -> None:
+        if rate <= 0:
+            return
+        t = 0.0
+        while t < duration:
+            schedule.append((start + t, label))
+            t += rng.expovariate(rate) if args.poisson else 1.0 / rate
+
+    rng = random.Random(args.seed)
+
+    if args.shape == "constant":
+        _constant(0.0, args.duration, args.rate, f"{args.rate:g}rps")
+    elif args.shape == "step":
+        rate, start = args.rate, 0.0
+        while rate <= args.max_rate:
+            _constant(start, args.step_sec, rate, f"{rate:g}rps")
+            start += args.step_sec
+            rate += args.rate_step or args.rate
+    elif args.shape == "ramp":
+        # 0 → max_rate まで線形に上げる
+        t = 0.0
+        while t < args.duration:
+            rate = max(0.5, args.max_rate * t / args.duration)
+            schedule.append((t, f"{int(rate // args.rate) * args.rate:g}rps"))
+            t += 1.0 / rate
+    elif args.shape == "burst":
+        # ベースのレートに、burst_period 秒ごとに burst_size 件の同時送信を重ねる
+        _constant(0.0, args.duration, args.rate, "base")
+        t = args.burst_period
+        while t < args.duration:
+            schedule.extend((t, "burst") for _ in range(args.burst_size))
+            t += args.burst_period
+    else:
+        raise ValueError(f"Unknown shape: {args.shape}")
+
+    schedule.sort(key=lambda x: x[0])
+    return schedule
+
+
+# ----------------------------
+# メモリ計測（Linux の /proc を使用）
+# ----------------------------
+def _rss_kb(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def _child_pids(pid: int) -> List[int]:
+    children: List[int] = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children.extend(int(c) for c in f.read().split())
+    except OSError:
+        pass
+    return children
+
+
+def worker_pids(server_pid: int) -> List[int]:
+    """
+    uvicorn --workers N ならワーカー（子プロセス）、1 プロセス構成なら本体を返す。
+    multiprocessing の resource tracker などメモリの小さい補助プロセスは除く。
+    """
+    children = [p for p in _child_pids(server_pid) if (_rss_kb(p) or 0) > 20_000]
+    return children or [server_pid]
+
+
+@dataclass
+class MemorySampler:
+    pids: List[int]
+    samples: Dict[int, List[int]] = field(default_factory=dict)
+
+    async def run(self, interval: float, stop: asyncio.Event) -> None:
+        while not stop.is_set():
+            for pid in self.pids:
+                rss = _rss_kb(pid)
+                if rss is not None:
+                    self.samples.setdefault(pid, []).append(rss)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def report(self, n_requests: int) -> List[Dict[str, Any]]:
+        rows = []
+        # ワーカー間でリクエストはほぼ均等に分散される前提で、1 ワーカーあたりの件数で割る
+        per_worker = max(n_requests / max(len(self.samples), 1), 1)
+        for pid, values in self.samples.items():
+            growth = values[-1] - values[0]
+            rows.append({
+                "pid": pid,
+                "start_mb": round(values[0] / 1024, 1),
+                "peak_mb": round(max(values) / 1024, 1),
+                "end_mb": round(values[-1] / 1024, 1),
+                "growth_mb": round(growth / 1024, 1),
+                "growth_kb_per_1k_requests": round(growth / per_worker * 1000, 1),
+            })
+        return rows
+
+
+# ----------------------------
+# 送信・集計
+# ----------------------------
+@dataclass
+class Result:
+    label: str
+    sent_at: float
+    latency: float
+    status: int
+    # LINE の受付制限は 200 + 混雑メッセージの返信なので、ステータスとは別に持つ
+    busy: bool = False
+
+
+async def _send(
+    client: httpx.AsyncClient,
+    url: str,
+    body: str,
+    secret: str,
+    label: str,
+    started: float,
+    results: List[Result],
+) -> None:
+    headers = {"Content-Type": "application/json", "X-Line-Signature": compute_signature(body, secret)}
+    sent_at = time.monotonic()
+    busy = False
+    try:
+        resp = await client.post(url, content=body.encode("utf-8"), headers=headers)
+        status = resp.status_code
+        busy = int(resp.headers.get(BUSY_REPLIES_HEADER, "0")) > 0
+    except httpx.HTTPError:
+        status = 0
+    results.append(Result(label, sent_at - started, time.monotonic() - sent_at, status, busy))
+
+
+async def run_load(args: argparse.Namespace, pids: List[int]) -> Dict[str, Any]:
+    schedule = build_schedule(args)
+    rng = random.Random(args.seed)
+    replay = load_replay_bodies(args.replay) if args.replay else None
+    url = args.url.rstrip("/") + "/webhook/line"
+
+    results: List[Result] = []
+    sampler = MemorySampler(pids)
+    stop = asyncio.Event()
+    sampler_task = asyncio.create_task(sampler.run(args.mem_interval, stop)) if pids else None
+
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        started = time.monotonic()
+        tasks = []
+        for i, (offset, label) in enumerate(schedule):
+            delay = started + offset - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            body = replay[i % len(replay)] if replay else synthesize_body(args.users, rng)
+            tasks.append(asyncio.create_task(
+                _send(client, url, body, args.channel_secret, label, started, results)
+            ))
+        await asyncio.gather(*tasks)
+
+    stop.set()
+    if sampler_task:
+        await sampler_task
+
+    return summarize(results, sampler.report(len(results)), args.knee_factor)
+
+
+def _percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def summarize(results: List[Result], memory: List[Dict[str, Any]], knee_factor: float) -> Dict[str, Any]:
+    """
+    ステップごとに達成スループット・レイテンシ・平均同時実行数（リトルの法則）を出し、
+    飽和スループットと膝（p95 が最初のステップの knee_factor 倍を超える、または
+    達成スループットが送信レートの 90% を下回る直前のステップ）を求める。
+    429 / 503 に加え、200 でも「混雑中」と返信したリクエスト（busy）は shed として数え、スループットに含めない。
+    """
+    by_label: Dict[str, List[Result]] = {}
+    for r in results:
+        by_label.setdefault(r.label, []).append(r)
+
+    steps = []
+    for label, rows in by_label.items():
+        window = max(r.sent_at for r in rows) - min(r.sent_at for r in rows) or 1.0
+        ok = [r for r in rows if 200 <= r.status < 300 and not r.busy]
+        latencies = [r.latency for r in ok]
+        offered = len(rows) / window
+        throughput = len(ok) / window
+        mean_latency = sum(latencies) / len(latencies) if latencies else 0.0
+        steps.append({
+            "step": label,
+            "requests": len(rows),
+            "offered_rps": round(offered, 2),
+            "throughput_rps": round(throughput, 2),
+            "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(_percentile(latencies, 99) * 1000, 1),
+            "shed": sum(1 for r in rows if r.status in (429, 503) or r.busy),
+            "errors": sum(1 for r in rows if r.status == 0 or (r.status >= 500 and r.status != 503)),
+            "concurrency": round(throughput * mean_latency, 2),
+            "_first_sent": min(r.sent_at for r in rows),
+        })
+    steps.sort(key=lambda s: s["_first_sent"])
+    for s in steps:
+        del s["_first_sent"]
+
+    knee = None
+    if steps:
+        baseline_p95 = steps[0]["p95_ms"] or 1.0
+        for prev, cur in zip(steps, steps[1:]):
+            if cur["p95_ms"] > baseline_p95 * knee_factor or cur["throughput_rps"] < 0.9 * cur["offered_rps"]:
+                knee = prev
+                break
+
+    return {
+        "total_requests": len(results),
+        "saturation_throughput_rps": max((s["throughput_rps"] for s in steps), default=0.0),
+        "knee": {
+            "step": knee["step"],
+            "throughput_rps": knee["throughput_rps"],
+            "concurrency": knee["concurrency"],
+            "p95_ms": knee["p95_ms"],
+        } if knee else None,
+        "steps": steps,
+        "memory_per_worker": memory,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    cols = ["step", "requests", "offered_rps", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "shed", "errors", "concurrency"]
+    print("\t".join(cols))
+    for s in report["steps"]:
+        print("\t".join(str(s[c]) for c in cols))
+    print()
+    print(f"saturation throughput: {report['saturation_throughput_rps']} rps")
+    knee = report["knee"]
+    if knee:
+        print(f"concurrency knee: {knee['concurrency']} in flight at {knee['step']} "
+              f"({knee['throughput_rps']} rps, p95 {knee['p95_ms']} ms)")
+    else:
+        print("concurrency knee: not reached")
+    for m in report["memory_per_worker"]:
+        print(f"worker {m['pid']}: {m['start_mb']} → {m['end_mb']} MB "
+              f"(peak {m['peak_mb']} MB, {m['growth_kb_per_1k_requests']} KB / 1k requests)")
+
+
+# ----------------------------
+# アプリ起動
+# ----------------------------
+def spawn_app(args: argparse.Namespace) -> subprocess.Popen:
+    """
+    偽バックエンドのアプリを uvicorn で起動し、/health が返るまで待つ。
+    """
+    # まとめ処理の待ち時間は応答時間にそのまま乗るので、既定では無効にして 1 件ずつの処理を測る
+    env = dict(os.environ, LINE_CHANNEL_SECRET=args.channel_secret, LINE_BATCH_WINDOW_MS=str(args.batch_window_ms))
+    port = args.url.rsplit(":", 1)[-1].rstrip("/")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.fake_app:app",
+         "--port", port, "--workers", str(args.workers), "--log-level", "warning"],
+        env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(args.url.rstrip("/") + "/health", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("Fake app did not become healthy within 60 seconds.")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--url", default="http://127.0.0.1:8765")
+    p.add_argument("--channel-secret", default=os.getenv("LINE_CHANNEL_SECRET", "fake-line_channel_secret"))
+    p.add_argument("--shape", choices=["constant", "step", "ramp", "burst"], default="step")
+    p.add_argument("--rate", type=float, default=5.0, help="constant / burst のレート、step の初期レートと刻み")
+    p.add_argument("--rate-step", type=float, default=None, help="step の刻み（省略時は --rate）")
+    p.add_argument("--max-rate", type=float, default=50.0, help="step / ramp の最大レート")
+    p.add_argument("--step-sec", type=float, default=10.0)
+    p.add_argument("--duration", type=float, default=60.0)
+    p.add_argument("--burst-size", type=int, default=20)
+    p.add_argument("--burst-period", type=float, default=10.0)
+    p.add_argument("--poisson", action="store_true", help="等間隔ではなくポアソン到着にする")
+    p.add_argument("--users", type=int, default=20, help="合成するユーザー数")
+    p.add_argument("--replay", default=None, help="再生する Webhook 本文 (JSONL)")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--timeout", type=float, default=30.0)
+    p.add_argument("--max-connections", type=int, default=1000)
+    p.add_argument("--knee-factor", type=float, default=2.0)
+    p.add_argument("--spawn-app", action="store_true", help="偽バックエンドのアプリを起動して計測する")
+    p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--batch-window-ms", type=int, default=0,
+                   help="--spawn-app で起動するアプリの LINE_BATCH_WINDOW_MS（0 でまとめ処理なし）")
+    p.add_argument("--server-pid", type=int, default=None, help="メモリを計測するサーバーの PID")
+    p.add_argument("--mem-interval", type=float, default=0.5)
+    p.add_argument("--json-out", default=None)
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+
+    proc = spawn_app(args) if args.spawn_app else None
+    try:
+        server_pid = proc.pid if proc else args.server_pid
+        pids = worker_pids(server_pid) if server_pid else []
+        report = asyncio.run(run_load(args, pids))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    print_report(report)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+プロンプトのサイズと 1 回の解析あたりのトークン数を測り、ベースラインと比べて
+増えすぎていたら終了コード 1 で失敗する回帰ベンチマーク。
+
+    # 偽の Gemini（プロンプト長からトークン数を概算）で測る。API キー不要
+    python -m benchmarks.prompt_tokens
+
+    # 実際の Gemini で測る（LLM_API_KEY が必要）
+    python -m benchmarks.prompt_tokens --backend live
+
+    # プロンプトを意図的に変えたときはベースラインを更新する
+    python -m benchmarks.prompt_tokens --update-baseline
+
+ベースラインは benchmarks/prompt_budget.json に置く。
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+from benchmarks.line_webhook_load import SAMPLE_TEXTS
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "prompt_budget.json")
+
+# まとめ解析（build_batch_prompt）を測るときの 1 バッチの件数。続けて送られる短いメッセージの典型的な数
+BATCH_SIZE = 4
+
+
+def load_baseline(path: str = BASELINE_PATH) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def measure_static_prompts() -> Dict[str, int]:
+    """
+    入力文を除いたプロンプト（テンプレート部分）の文字数を返す。
+    まとめ解析のプロンプトは件数に比例して伸びる部分（番号付きの行）も含めて、BATCH_SIZE 件分で測る。
+    """
+    from app.clients import llm_client
+
+    empty_batch = [""] * BATCH_SIZE
+    prompts = {
+        "build_prompt": llm_client.build_prompt(""),
+        "build_extraction_prompt": llm_client.build_extraction_prompt(""),
+        "build_batch_prompt": llm_client.build_batch_prompt(empty_batch),
+        "build_batch_prompt/extraction": llm_client.build_batch_prompt(empty_batch, classify=False),
+    }
+    return {name: len(prompt) for name, prompt in prompts.items()}
+
+
+def measure_tokens_per_parse(texts: List[str], classify: bool, batch_size: int = 1) -> Dict[str, float]:
+    """
+    texts を解析し、タスク 1 件あたりの平均トークン数を返す。
+    batch_size が 2 以上なら、その件数ずつ parse_multiple_tasks でまとめて解析する（LINE のまとめ処理と同じ）。
+    hedge / fallback で余分に呼んだ分も課金されるので平均に含める。
+    """
+    from app.clients import llm_client
+    from app.services import metrics
+
+    metrics.reset()
+    for i in range(0, len(texts), batch_size):
+        if batch_size > 1:
+            llm_client.parse_multiple_tasks(texts[i:i + batch_size], classify=classify, endpoint="benchmark")
+        else:
+            llm_client.parse_task_text(texts[i], classify=classify, endpoint="benchmark")
+
+    def _total(**labels: str) -> float:
+        return sum(
+            metrics.get_value("llm_tokens_total", model=model, user="anonymous", endpoint="benchmark", **labels)
+            for model in {llm_client.LLM_MODEL, llm_client.LLM_FALLBACK_MODEL}
+        )
+
+    n = len(texts) or 1
+    return {
+        "prompt": round(_total(kind="prompt") / n, 1),
+        "response": round(_total(kind="response") / n, 1),
+    }
+
+
+def find_regressions(
+    measured: Dict[str, float],
+    budget: Dict[str, float],
+    tolerance: float,
+) -> List[str]:
+    """
+    budget × (1 + tolerance) を超えた項目と、budget がない項目をメッセージのリストで返す
+    （プロンプトを追加したのにベースラインを更新し忘れると、素通りしてしまうため）。
+    """
+    problems = [f"{name}: no budget" for name in measured if name not in budget]
+    for name, limit in budget.items():
+        value = measured.get(name)
+        if value is None:
+            continue
+        if value > limit * (1 + tolerance):
+            problems.append(f"{name}: {value} > budget {limit} (+{tolerance:.0%})")
+    return problems
+
+
+def _use_fake_backend() -> None:
+    # fake_app は import 時に Gemini / Notion / LINE を偽物に差し替える
+    import benchmarks.fake_app  # noqa: F401
+
+    os.environ.setdefault("FAKE_LLM_LATENCY_MS", "0")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="プロンプトサイズとトークン数の回帰ベンチマーク")
+    p.add_argument("--backend", choices=("fake", "live"), default="fake")
+    p.add_argument("--baseline", default=BASELINE_PATH)
+    p.add_argument("--update-baseline", action="store_true", help="測定値でベースラインを書き換える")
+    args = p.parse_args(argv)
+
+    if args.backend == "fake":
+        _use_fake_backend()
+
+    baseline = load_baseline(args.baseline)
+    tolerance = baseline.get("tolerance", 0.1)
+    budgets = baseline.get("tokens_per_parse", {}).get(args.backend)
+    if budgets is None and not args.update_baseline:
+        # ベースラインがないと比べようがなく、常に成功してしまうので失敗にする
+        print(f"[ERROR] No '{args.backend}' baseline in {args.baseline}. "
+              f"Run with --backend {args.backend} --update-baseline first.")
+        return 1
+
+    static = measure_static_prompts()
+    per_parse = {
+        "full": measure_tokens_per_parse(SAMPLE_TEXTS, classify=True),
+        "extraction": measure_tokens_per_parse(SAMPLE_TEXTS, classify=False),
+        "batch": measure_tokens_per_parse(SAMPLE_TEXTS, classify=True, batch_size=BATCH_SIZE),
+        "batch_extraction": measure_tokens_per_parse(SAMPLE_TEXTS, classify=False, batch_size=BATCH_SIZE),
+    }
+
+    print(f"Static prompt size (chars, batches of {BATCH_SIZE}):")
+    for name, chars in static.items():
+        print(f"  {name:<30} {chars}")
+    print(f"Average tokens per parse ({args.backend}, {len(SAMPLE_TEXTS)} texts):")
+    for name, tokens in per_parse.items():
+        print(f"  {name:<30} prompt={tokens['prompt']} response={tokens['response']}")
+
+    if args.update_baseline:
+        baseline["static_chars"] = static
+        baseline.setdefault("tokens_per_parse", {})[args.backend] = per_parse
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"Updated {args.baseline}")
+        return 0
+
+    problems = find_regressions(static, baseline.get("static_chars", {}), tolerance)
+    for name, tokens in per_parse.items():
+        if name not in budgets:
+            problems.append(f"{name}: no budget")
+            continue
+        problems += [f"{name}.{msg}" for msg in find_regressions(tokens, budgets[name], tolerance)]
+
+    if problems:
+        print("[ERROR] Prompt budget regression:")
+        for msg in problems:
+            print(f"  {msg}")
+        return 1
+    print("OK: within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())